@@ -0,0 +1,479 @@
+"""
+Offline stand-ins for Discord, yt-dlp, Spotify, Redis and ffmpeg, used by the benchmarks.
+
+``FakeBot`` runs the real QueueManager, TrackResolver,
+ResolveCache, PlaylistIngestor and PlaybackScheduler, and the real cogs can be
+driven with ``FakeInteraction``. Only the network, the gateway and the audio
+processes are replaced. Resolver latencies are configurable and yt-dlp stubs
+block their worker thread, like the real extractor does.
+"""
+import asyncio
+import hashlib
+import importlib
+import os
+import threading
+import time
+
+import discord
+
+import modules.guild_player
+from modules.audio_source import FRAME_SECONDS
+from modules.music_control_view import MusicControlView
+from modules.playback_scheduler import PlaybackScheduler
+from modules.playlist_ingestor import PlaylistIngestor
+from modules.queue_manager import QueueManager
+from modules.queue_store import MemoryQueueStore
+from modules.queue_view import QueuePages
+from modules.resolve_cache import ResolveCache
+from modules.spotify_client import SpotifyClient, StubSpotifyBackend
+from modules.track_resolver import PLAYLIST_PAGE_SIZE, TrackResolver
+from modules.ytdl_resolver import YTDLResolver
+
+OPUS_FRAME = b"\xfc" * 160  # Size of a typical 20ms Opus frame
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=6).hexdigest()
+
+
+# ---- Resolvers ---------------------------------------------------------------
+
+class StubYoutubeDL:
+    """Answers ``extract_info`` with generated videos after ``latency`` seconds of blocking."""
+    def __init__(self, latency, duration=180):
+        self.latency = latency
+        self.duration = duration
+
+    def _video(self, video_id):
+        return {
+            "id": video_id,
+            "title": f"Video {video_id}",
+            "url": f"https://media.example/{video_id}.webm",
+            "duration": self.duration,
+            "thumbnails": [{"url": f"https://img.example/{video_id}.jpg"}],
+            "acodec": "opus",
+        }
+
+    def extract_info(self, query, download=False):
+        time.sleep(self.latency)  # Blocks the worker thread, like a real extraction
+        if query.startswith("ytsearch:"):
+            return {"entries": [self._video(_digest(query))]}
+        return self._video(query)
+
+
+class StubYTDLResolver(YTDLResolver):
+    """The real thread-pool resolver, extracting with ``StubYoutubeDL``."""
+    def __init__(self, latency, duration=180, **kwargs):
+        super().__init__(**kwargs)
+        self._stub = StubYoutubeDL(latency, duration)
+
+    def _get_ytdl(self):
+        return self._stub
+
+
+class GeneratedSpotifyBackend(StubSpotifyBackend):
+    """
+    Spotify backend that makes up a track for any search or track ID, and a
+    playlist of ``playlist_length`` tracks for any playlist ID.
+    """
+    def __init__(self, latency=0.0, playlist_length=100):
+        super().__init__(latency=latency)
+        self.playlist_length = playlist_length
+
+    @staticmethod
+    def _track(track_id):
+        return {
+            "id": track_id,
+            "name": f"Song {track_id}",
+            "duration_ms": 180_000,
+            "artists": [{"name": f"Artist {int(track_id, 16) % 500}"}],
+            "album": {"images": [{"url": f"https://img.example/{track_id}.jpg"}]},
+        }
+
+    async def get(self, path, params=None):
+        self.calls.append((path, params))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = params or {}
+        if path == "/search":
+            return {"tracks": {"items": [self._track(_digest(params["q"]))]}}
+        if path.startswith("/tracks/"):
+            return self._track(_digest(path))
+        if path == "/tracks":
+            return {"tracks": [self._track(_digest(f"/tracks/{track_id}")) for track_id in params["ids"].split(",")]}
+        if path.startswith("/playlists/"):
+            playlist_id = path.split("/")[2]
+            offset = params.get("offset", 0)
+            end = min(offset + params.get("limit", PLAYLIST_PAGE_SIZE), self.playlist_length)
+            return {
+                "items": [{"track": self._track(_digest(f"{playlist_id}:{index}"))} for index in range(offset, end)],
+                "next": "more" if end < self.playlist_length else None,
+            }
+        return await super().get(path, params)
+
+
+# ---- Storage -----------------------------------------------------------------
+
+class FakeRedis:
+    """
+    In-memory stand-in for the ``redis.asyncio`` client calls RedisQueueStore
+    makes. Fields and values come back as bytes, like a real client's.
+    """
+    def __init__(self):
+        self.hashes = {}
+        self.transactions = 0
+        self.closed = False
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(str(field).encode())
+
+    def pipeline(self, transaction=True):
+        return FakeRedisPipeline(self)
+
+    async def aclose(self):
+        self.closed = True
+
+
+class FakeRedisPipeline:
+    """Queues HSET and HDEL commands and applies them together on ``execute``."""
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+    def hset(self, key, field, value):
+        self.commands.append((key, str(field).encode(), value.encode()))
+
+    def hdel(self, key, field):
+        self.commands.append((key, str(field).encode(), None))
+
+    async def execute(self):
+        for key, field, value in self.commands:
+            fields = self.client.hashes.setdefault(key, {})
+            if value is None:
+                fields.pop(field, None)
+            else:
+                fields[field] = value
+        self.client.transactions += 1
+        self.commands = []
+
+
+# ---- Audio and voice ---------------------------------------------------------
+
+class FakeAudioSource(discord.AudioSource):
+    """Serves silent Opus frames for the song's duration instead of running ffmpeg."""
+    mode = "opus"
+
+    def __init__(self, stream, start_at=0.0):
+        self.stream = stream
+        self.frames = max(0, int((stream.get("duration") or 180) - start_at) * int(1 / FRAME_SECONDS))
+        self.read_frames = 0
+        self.closed = False
+
+    def read(self):
+        if self.read_frames >= self.frames:
+            return b""
+        self.read_frames += 1
+        return OPUS_FRAME
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        self.closed = True
+
+
+def use_fake_audio():
+    """Make the players open ``FakeAudioSource`` instead of starting ffmpeg."""
+    modules.guild_player.create_source = FakeAudioSource
+
+
+class FakeVoiceClient:
+    """
+    Voice client whose ``after`` callback runs on a separate thread, as with
+    discord.py's audio player.
+
+    With ``realtime`` each track is played by a thread that reads one frame
+    every 20ms and counts the frame slots it missed by falling behind. Otherwise tracks
+    only end when ``finish`` is called.
+    """
+    def __init__(self, bot, guild, channel, realtime=False):
+        self.bot = bot
+        self.guild = guild
+        self.channel = channel
+        self.realtime = realtime
+        self.source = None
+        self._after = None
+        self._playing = False
+        self._paused = threading.Event()
+        self._stopped = threading.Event()  # Replaced for every track, so a stopped track's thread stays stopped
+        self._lock = threading.Lock()
+        self._connected = True
+        self.played = 0
+        self.last_play_at = None  # time.monotonic() of the latest play()
+        self.frames_sent = 0
+        self.frames_late = 0
+
+    def is_connected(self):
+        return self._connected
+
+    def is_playing(self):
+        return self._playing and not self._paused.is_set()
+
+    def is_paused(self):
+        return self._playing and self._paused.is_set()
+
+    def play(self, source, *, after=None):
+        with self._lock:
+            if self._playing:
+                raise discord.ClientException("Already playing audio.")
+            self.source, self._after = source, after
+            self._playing = True
+            self._paused.clear()
+            self._stopped = threading.Event()
+        self.played += 1
+        self.last_play_at = time.monotonic()
+        if self.realtime:
+            threading.Thread(target=self._play_frames, args=(source, self._stopped), daemon=True).start()
+
+    def _play_frames(self, source, stopped):
+        """Pace frames like discord.py's AudioPlayer, counting frame slots missed while behind."""
+        next_frame = time.perf_counter()
+        while not stopped.is_set():
+            if self._paused.is_set():
+                time.sleep(FRAME_SECONDS)
+                next_frame = time.perf_counter()
+                continue
+            if not source.read():
+                self._end(source)
+                return
+            self.frames_sent += 1
+            next_frame += FRAME_SECONDS
+            delay = next_frame - time.perf_counter()
+            if delay < -FRAME_SECONDS:
+                self.frames_late += int(-delay / FRAME_SECONDS)
+                next_frame = time.perf_counter()  # discord.py resets its clock when it falls behind
+            elif delay > 0:
+                time.sleep(delay)
+
+    def _release(self, source):
+        """Stop tracking ``source`` if it is still the current track; returns its ``after`` callback."""
+        with self._lock:
+            if self.source is not source or not self._playing:
+                return None
+            after, self._after = self._after, None
+            self._playing = False
+            self._stopped.set()
+            return after
+
+    def _end(self, source):
+        after = self._release(source)
+        source.cleanup()
+        if after:
+            after(None)
+
+    def finish(self):
+        """End the current track as if it had played to the end."""
+        if self._playing:
+            threading.Thread(target=self._end, args=(self.source,)).start()
+
+    def stop(self):
+        source = self.source
+        after = self._release(source)  # Not playing from here on, like VoiceClient.stop
+        if source is not None:
+            def end():
+                source.cleanup()
+                if after:
+                    after(None)
+            threading.Thread(target=end).start()
+
+    def pause(self):
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    async def disconnect(self, *, force=False):
+        self._release(self.source)
+        self._connected = False
+        self.guild.voice_client = None
+
+
+# ---- Gateway objects ---------------------------------------------------------
+
+class FakeMessage:
+    def __init__(self, content=None, embed=None, view=None):
+        self.content = content
+        self.embed = embed
+        self.view = view
+
+
+class FakeVoiceChannel:
+    def __init__(self, bot, guild, channel_id):
+        self.bot = bot
+        self.guild = guild
+        self.id = channel_id
+        self.members = []
+        self.sent = 0
+
+    async def connect(self):
+        voice_client = FakeVoiceClient(self.bot, self.guild, self, self.bot.realtime_audio)
+        self.guild.voice_client = voice_client
+        return voice_client
+
+    async def send(self, content=None, *, embed=None, view=None):
+        self.sent += 1
+        return FakeMessage(content, embed, view)
+
+
+class FakeMember:
+    def __init__(self, member_id, channel):
+        self.id = member_id
+        self.bot = False
+        self.voice = _VoiceState(channel) if channel else None
+
+
+class _VoiceState:
+    def __init__(self, channel):
+        self.channel = channel
+
+
+class FakeGuild:
+    def __init__(self, bot, guild_id):
+        self.id = guild_id
+        self.shard_id = 0
+        self.voice_client = None
+        self.voice_channel = FakeVoiceChannel(bot, self, guild_id * 10)
+        self.member = FakeMember(guild_id * 10 + 1, self.voice_channel)
+        self.voice_channel.members.append(self.member)
+
+
+class FakeResponse:
+    """Interaction response that records when it was first used."""
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.responded_at = None
+        self.messages = []
+
+    def _respond(self, message):
+        if self.responded_at is None:
+            self.responded_at = time.monotonic()
+        self.messages.append(message)
+
+    def is_done(self):
+        return self.responded_at is not None
+
+    async def defer(self, *, ephemeral=False, thinking=False):
+        self._respond(None)
+
+    async def send_message(self, content=None, *, embed=None, view=None, ephemeral=False):
+        self._respond(FakeMessage(content, embed, view))
+
+    async def edit_message(self, *, content=None, embed=None, view=None):
+        self._respond(FakeMessage(content, embed, view))
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.messages = []
+
+    async def send(self, content=None, *, embed=None, view=None, ephemeral=False):
+        message = FakeMessage(content, embed, view)
+        self.messages.append(message)
+        return message
+
+
+class FakeInteraction:
+    """Slash command or button interaction from the guild's only member."""
+    def __init__(self, guild):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = guild.member
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.extras = {"started_at": time.monotonic()}  # Set by ApolloTree.interaction_check in the bot
+
+
+async def invoke(cog, command, guild, *args):
+    """
+    Run one of a cog's slash commands the way the command tree would.
+
+    Args:
+        cog (commands.Cog): The cog instance.
+        command (app_commands.Command): The command, e.g. ``PlayCog.play``.
+        guild (FakeGuild): The guild it is used in.
+
+    Returns:
+        FakeInteraction: The interaction, with the responses it received.
+    """
+    interaction = FakeInteraction(guild)
+    await command.callback(cog, interaction, *args)
+    return interaction
+
+
+# ---- Bot ---------------------------------------------------------------------
+
+class FakeBot:
+    """
+    Just enough of ``commands.Bot`` for the cogs and modules, wired to the real
+    shared components.
+    """
+    def __init__(self, spotify_latency=0.05, ytdl_latency=0.3, ytdl_workers=4, playlist_length=100,
+                 ingest_max_ahead=None, realtime_audio=False, song_seconds=180):
+        self.realtime_audio = realtime_audio
+        self.latency = 0.05  # Gateway heartbeat latency, read by /ping
+        self.cogs = {}
+        self._guilds = {}
+        self.QueueManager = QueueManager(MemoryQueueStore(), max_length=0)
+        self.YTDLResolver = StubYTDLResolver(ytdl_latency, song_seconds, max_workers=ytdl_workers)
+        self.SpotifyClient = SpotifyClient(GeneratedSpotifyBackend(spotify_latency, playlist_length))
+        self.ResolveCache = ResolveCache(path="")
+        self.AudioCache = None
+        self.TrackResolver = TrackResolver(self.SpotifyClient, self.YTDLResolver, self.ResolveCache)
+        ingest_options = {"max_ahead": ingest_max_ahead} if ingest_max_ahead else {}
+        self.PlaylistIngestor = PlaylistIngestor(self.TrackResolver, self.QueueManager, **ingest_options)
+        self.PlaybackScheduler = PlaybackScheduler(self, self.QueueManager, self.TrackResolver)
+        self.QueuePages = QueuePages(self.QueueManager)
+        self.MusicControlView = MusicControlView
+
+    async def add_cog(self, cog):
+        self.cogs[type(cog).__name__] = cog
+
+    async def load_cogs(self, path="cogs"):
+        """Run the ``setup`` of every cog module in ``path``, like ``ApolloBot.load_cogs``."""
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(".py"):
+                module = importlib.import_module(f"{path.replace(os.sep, '.')}.{filename[:-3]}")
+                await module.setup(self)
+
+    def add_guild(self, guild_id):
+        guild = self._guilds[guild_id] = FakeGuild(self, guild_id)
+        return guild
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(guild_id)
+
+    def get_channel(self, channel_id):
+        return self._guilds.get(channel_id // 10, None) and self._guilds[channel_id // 10].voice_channel
+
+    @property
+    def guilds(self):
+        return list(self._guilds.values())
+
+    @property
+    def voice_clients(self):
+        return [guild.voice_client for guild in self._guilds.values() if guild.voice_client]
+
+    async def close(self):
+        await self.SpotifyClient.close()
+        await self.ResolveCache.close()
+        self.YTDLResolver.shutdown()
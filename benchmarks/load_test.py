@@ -0,0 +1,214 @@
+"""
+Multi-guild load test: how many busy guilds can one bot process handle?
+
+Loads the real cogs from cogs/ onto the fake bot and simulates a growing
+number of guilds. Each guild joins voice with /play, then issues /play, /add,
+/next, /queue and control-button presses at random, at the configured rates.
+Every voice client plays its track on its own thread, reading a frame every
+20ms like discord.py's audio player, so the process carries the same threads
+and wake-ups it would in production.
+
+For each guild count, the run reports event-loop lag percentiles, command
+latency per command, audio frames missed because the player thread fell
+behind, CPU use and memory growth. Results are printed as JSON.
+
+Run from the repository root:
+    python -m benchmarks.load_test [--guilds 10,50,100] [--duration 30] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.fakes import FakeBot, FakeInteraction, invoke, use_fake_audio
+from benchmarks.pipeline import git_revision, summarize
+
+LAG_PROBE_SECONDS = 0.01  # Sleep of one lag probe; anything beyond it is time the loop was busy
+ACTIONS = ("play", "add", "next", "queue", "button")
+
+
+def rss_bytes():
+    """Resident memory of this process, or its peak where the current value is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoadTest:
+    """Runs simulated guilds against one fake bot and measures each step of guild count."""
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.bot = FakeBot(
+            args.spotify_latency, args.ytdl_latency, ytdl_workers=args.ytdl_workers,
+            realtime_audio=True, song_seconds=args.song_seconds,
+        )
+        self.rates = {action: getattr(args, f"{action}_rate") / 60 for action in ACTIONS}  # Per second
+        self.commands = {}  # name -> (cog, command)
+        self.sessions = []
+        self.latencies = defaultdict(list)  # Command -> seconds, for the current step
+        self.lags = []
+        self.errors = 0
+
+    async def setup(self):
+        await self.bot.load_cogs()
+        for cog in self.bot.cogs.values():
+            for command in cog.get_app_commands():
+                self.commands[command.name] = (cog, command)
+
+    def query(self):
+        return f"load test song {self.rng.randrange(self.args.catalogue)}"
+
+    async def run_command(self, name, guild, *args):
+        cog, command = self.commands[name]
+        started = time.monotonic()
+        try:
+            await invoke(cog, command, guild, *args)
+        except Exception:
+            self.errors += 1
+        self.latencies[name].append(time.monotonic() - started)
+
+    async def press_button(self, guild):
+        """Press pause/resume or skip on a control view, as users do under the "Now Playing" message."""
+        player = self.bot.PlaybackScheduler.get_player(guild.id)
+        view = self.bot.MusicControlView(player)
+        button = self.rng.choice((view.pause_resume_button, view.skip_button))
+        started = time.monotonic()
+        try:
+            await button.callback(FakeInteraction(guild))
+        except Exception:
+            self.errors += 1
+        self.latencies["button"].append(time.monotonic() - started)
+
+    async def guild_session(self, guild):
+        """One guild's users: join with /play, then act at random at the configured rates."""
+        await asyncio.sleep(self.rng.uniform(0, 1))  # Spread the joins of a step
+        await self.run_command("play", guild, self.query())
+        actions = [action for action in ACTIONS if self.rates[action]]
+        weights = [self.rates[action] for action in actions]
+        total_rate = sum(weights)
+        if not total_rate:
+            return
+        while True:
+            await asyncio.sleep(self.rng.expovariate(total_rate))
+            action = self.rng.choices(actions, weights)[0]
+            if action == "button":
+                await self.press_button(guild)
+            elif action == "queue":
+                await self.run_command("queue", guild)
+            elif action == "next":
+                await self.run_command("next", guild)
+            else:
+                await self.run_command(action, guild, self.query())
+
+    async def probe_lag(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_SECONDS)
+            self.lags.append(max(0.0, time.perf_counter() - started - LAG_PROBE_SECONDS))
+
+    def frame_counts(self):
+        voice_clients = self.bot.voice_clients
+        return sum(vc.frames_sent for vc in voice_clients), sum(vc.frames_late for vc in voice_clients)
+
+    async def run_step(self, guild_count, baseline_rss):
+        """Grow to ``guild_count`` guilds, then measure for ``duration`` seconds."""
+        while len(self.bot.guilds) < guild_count:
+            guild = self.bot.add_guild(len(self.bot.guilds) + 1)
+            self.sessions.append(asyncio.create_task(self.guild_session(guild)))
+        await asyncio.sleep(self.args.warmup)
+
+        self.latencies.clear()
+        self.lags.clear()
+        self.errors = 0
+        sent_before, late_before = self.frame_counts()
+        cpu_before, wall_before = time.process_time(), time.monotonic()
+        await asyncio.sleep(self.args.duration)
+        sent_after, late_after = self.frame_counts()
+        elapsed = time.monotonic() - wall_before
+        rss = rss_bytes()
+
+        sent, late = sent_after - sent_before, late_after - late_before
+        return {
+            "guilds": guild_count,
+            "voice_clients": len(self.bot.voice_clients),
+            "threads": threading.active_count(),
+            "event_loop_lag": summarize(self.lags),
+            "commands": {name: summarize(samples) for name, samples in sorted(self.latencies.items())},
+            "command_errors": self.errors,
+            "frames_sent": sent,
+            "frames_missed": late,
+            "frames_missed_percent": round(100 * late / (sent + late), 3) if sent + late else 0.0,
+            "cpu_percent": round(100 * (time.process_time() - cpu_before) / elapsed, 1),
+            "rss_mb": round(rss / 2**20, 1),
+            "rss_growth_kb_per_guild": round((rss - baseline_rss) / 1024 / guild_count, 1),
+            "ytdl_queue_wait_p95_ms": round(self.bot.YTDLResolver.stats()["queue_wait_p95"] * 1000, 3),
+        }
+
+    async def run(self):
+        await self.setup()
+        baseline_rss = rss_bytes()
+        probe = asyncio.create_task(self.probe_lag())
+        steps = []
+        try:
+            for guild_count in self.args.guilds:
+                steps.append(await self.run_step(guild_count, baseline_rss))
+        finally:
+            probe.cancel()
+            for session in self.sessions:
+                session.cancel()
+            await asyncio.gather(probe, *self.sessions, return_exceptions=True)
+            for voice_client in self.bot.voice_clients:
+                await voice_client.disconnect()
+            self.bot.PlaybackScheduler.stop()
+            await self.bot.close()
+        return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--guilds", type=lambda text: [int(count) for count in text.split(",")], default=[10, 50, 100],
+                        help="Comma-separated guild counts to step through")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds measured per step")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds after adding guilds before measuring")
+    parser.add_argument("--play-rate", type=float, default=0.5, help="/play per guild per minute")
+    parser.add_argument("--add-rate", type=float, default=2, help="/add per guild per minute")
+    parser.add_argument("--next-rate", type=float, default=0.5, help="/next per guild per minute")
+    parser.add_argument("--queue-rate", type=float, default=2, help="/queue per guild per minute")
+    parser.add_argument("--button-rate", type=float, default=1, help="Button presses per guild per minute")
+    parser.add_argument("--song-seconds", type=int, default=60, help="Length of every simulated song")
+    parser.add_argument("--catalogue", type=int, default=2000, help="Distinct songs users pick from")
+    parser.add_argument("--spotify-latency", type=float, default=0.05)
+    parser.add_argument("--ytdl-latency", type=float, default=0.3)
+    parser.add_argument("--ytdl-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    use_fake_audio()
+    steps = asyncio.run(LoadTest(args).run())
+    report = {
+        "benchmark": "load_test",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "settings": {key: value for key, value in vars(args).items() if key != "output"},
+        "steps": steps,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""
+Offline benchmarks of the music pipeline: /play latency, playlist ingestion,
+multi-song /add, queue operation throughput and the overhead of changing tracks.
+
+Drives the real PlayCog, QueueCog, NextCog and QueueManager with the fakes in
+benchmarks/fakes.py, so no Discord connection, network or ffmpeg is needed.
+yt-dlp and Spotify answer after configurable latencies. Results are printed as
+JSON; save them with --output and pass an earlier file to --compare to see
+what changed between commits.
+
+Run from the repository root:
+    python -m benchmarks.pipeline [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.fakes import FakeBot, invoke, use_fake_audio
+from cogs.music_next import NextCog
+from cogs.music_play import PlayCog
+from cogs.music_queue import QueueCog
+from modules.queue_manager import QueueManager
+from modules.queue_store import MemoryQueueStore
+from modules.track import Track
+
+REGRESSION_THRESHOLD = 10  # Percent change reported as a regression by --compare
+UNGATED = ("p99_ms", "max_ms")  # Tail samples of short runs are too noisy to flag
+
+
+def summarize(samples):
+    """Count, mean and percentiles of latency samples in seconds, reported in milliseconds."""
+    samples = sorted(samples)
+    if not samples:
+        return {"count": 0}
+
+    def percentile(share):
+        return samples[min(len(samples) - 1, int(len(samples) * share))] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+def make_track(index):
+    return Track(f"Song {index}", f"Artist {index % 500}", f"{index:011d}", None, 180)
+
+
+async def wait_until(condition, timeout=30):
+    """Poll ``condition`` on the event loop until it holds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark condition not reached")
+        await asyncio.sleep(0.001)
+
+
+async def bench_play(args):
+    """/play of a search in an idle guild: command duration and time until audio starts, cold and cached."""
+    bot = FakeBot(args.spotify_latency, args.ytdl_latency)
+    cog = PlayCog(bot)
+    results = {}
+    for phase in ("cold", "cached"):
+        durations, to_audio = [], []
+        for index in range(args.plays):
+            guild = bot.add_guild(len(bot.guilds) + 1)
+            interaction = await invoke(cog, PlayCog.play, guild, f"benchmark song {index}")
+            durations.append(time.monotonic() - interaction.extras["started_at"])
+            if guild.voice_client and guild.voice_client.last_play_at:
+                to_audio.append(guild.voice_client.last_play_at - interaction.extras["started_at"])
+        results[phase] = {"command": summarize(durations), "time_to_audio": summarize(to_audio)}
+    bot.PlaybackScheduler.stop()
+    await bot.close()
+    return results
+
+
+async def bench_playlist(args):
+    """/play of a Spotify playlist: time until its first song plays and until every song is queued."""
+    bot = FakeBot(args.spotify_latency, args.ytdl_latency, playlist_length=args.playlist_length,
+                  ingest_max_ahead=args.playlist_length)
+    cog = PlayCog(bot)
+    guild = bot.add_guild(1)
+    interaction = await invoke(cog, PlayCog.play, guild, "https://open.spotify.com/playlist/benchmark")
+    started_at = interaction.extras["started_at"]
+    first_audio = guild.voice_client.last_play_at - started_at
+    await wait_until(lambda: not bot.PlaylistIngestor.is_ingesting(guild.id), timeout=600)
+    total = time.monotonic() - started_at
+    queued = len(bot.QueueManager.get_queue(guild.id)) + 1  # The first song is already playing
+    bot.PlaybackScheduler.stop()
+    await bot.close()
+    return {
+        "songs": queued,
+        "first_audio_ms": round(first_audio * 1000, 3),
+        "total_ms": round(total * 1000, 3),
+        "songs_per_sec": round(queued / total, 2),
+    }
+
+
+async def bench_add(args):
+    """/add of a pasted list of Spotify track links: command duration and the Spotify requests it made."""
+    bot = FakeBot(args.spotify_latency, args.ytdl_latency)
+    cog = QueueCog(bot)
+    guild = bot.add_guild(1)
+    links = " ".join(f"https://open.spotify.com/track/{index:012x}" for index in range(args.add_songs))
+    interaction = await invoke(cog, QueueCog.add, guild, links)
+    duration = time.monotonic() - interaction.extras["started_at"]
+    queued = len(bot.QueueManager.get_queue(guild.id))
+    spotify_requests = len(bot.SpotifyClient.backend.calls)
+    bot.PlaybackScheduler.stop()
+    await bot.close()
+    return {
+        "songs": queued,
+        "command_ms": round(duration * 1000, 3),
+        "spotify_request_count": spotify_requests,
+    }
+
+
+def _throughput(operation, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        operation()
+    elapsed = time.perf_counter() - started
+    return round(repeat / elapsed, 1)
+
+
+async def bench_queue_ops(args):
+    """Operations per second on one guild's queue of ``queue_length`` songs, plus rendering /queue pages."""
+    rng = random.Random(args.seed)
+    length = args.queue_length
+    queue_manager = QueueManager(MemoryQueueStore(), max_length=0)
+    songs = [make_track(index) for index in range(length)]
+    for song in songs:
+        queue_manager.add_to_queue(1, song)
+    repeat = args.queue_ops
+
+    def add_and_pop():
+        queue_manager.add_to_queue(1, songs[rng.randrange(length)])
+        queue_manager.pop_from_queue(1)
+
+    def remove_and_insert():
+        song = queue_manager.remove(1, rng.randrange(length - 1))
+        queue_manager.add_to_queue(1, song)
+
+    def page_at(start):
+        return queue_manager.page(1, start, start + 10)
+
+    results = {
+        "add_pop_per_sec": _throughput(add_and_pop, repeat),
+        "peek_per_sec": _throughput(lambda: queue_manager.peek(1, 10), repeat),
+        "page_per_sec": _throughput(lambda: page_at(rng.randrange(length - 10)), repeat),
+        "move_per_sec": _throughput(lambda: queue_manager.move(1, rng.randrange(length), rng.randrange(length)), repeat),
+        "remove_per_sec": _throughput(remove_and_insert, repeat),
+        "total_duration_per_sec": _throughput(lambda: queue_manager.total_duration(1), repeat),
+        "shuffle_per_sec": _throughput(lambda: queue_manager.shuffle(1), max(1, repeat // 1000)),
+    }
+
+    # /queue through the cog, alternating between cached pages and pages invalidated by a change
+    bot = FakeBot()
+    bot.QueueManager = queue_manager
+    bot.QueuePages.queue_manager = queue_manager
+    cog = QueueCog(bot)
+    guild = bot.add_guild(1)
+    cached, changed = [], []
+    for index in range(args.queue_commands):
+        if index % 2:
+            queue_manager.move(1, 0, length - 1)
+        started = time.perf_counter()
+        await invoke(cog, QueueCog.view_queue, guild, 1)
+        (changed if index % 2 else cached).append(time.perf_counter() - started)
+    results["queue_command"] = {"cached": summarize(cached), "after_change": summarize(changed)}
+    await queue_manager.close()
+    await bot.close()
+    return results
+
+
+async def bench_track_change(args):
+    """Time from the end of a track to the next one playing, and the cost of /next."""
+    bot = FakeBot(args.spotify_latency, args.ytdl_latency)
+    guild = bot.add_guild(1)
+    voice_client = await guild.voice_channel.connect()
+    for index in range(args.track_changes * 2 + 2):
+        bot.QueueManager.add_to_queue(guild.id, make_track(index))
+    await bot.PlaybackScheduler.advance(guild.id)
+    await wait_until(lambda: voice_client.played == 1)
+
+    natural = []
+    for _ in range(args.track_changes):
+        await asyncio.sleep(args.ytdl_latency * 2)  # Give prefetch time to resolve the next stream, as a song would
+        played = voice_client.played
+        ended_at = time.monotonic()
+        voice_client.finish()
+        await wait_until(lambda: voice_client.played > played)
+        natural.append(voice_client.last_play_at - ended_at)
+
+    cog = NextCog(bot)
+    skips = []
+    for _ in range(args.track_changes):
+        await asyncio.sleep(args.ytdl_latency * 2)
+        played = voice_client.played
+        interaction = await invoke(cog, NextCog.next_song, guild)
+        await wait_until(lambda: voice_client.played > played)
+        skips.append(voice_client.last_play_at - interaction.extras["started_at"])
+
+    bot.PlaybackScheduler.stop()
+    await bot.close()
+    return {"track_end": summarize(natural), "next_command": summarize(skips)}
+
+
+BENCHMARKS = {
+    "play": bench_play,
+    "playlist": bench_playlist,
+    "add": bench_add,
+    "queue_ops": bench_queue_ops,
+    "track_change": bench_track_change,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """Map dotted paths to every numeric result."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        elif isinstance(value, (int, float)) and not key.endswith("count") and key != "songs":
+            flat[path] = value
+    return flat
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Report how every result changed against a baseline run.
+
+    Latencies (``_ms``) are worse when they grow; throughputs (``_per_sec``)
+    when they shrink. Tail latencies are reported but never flagged.
+
+    Returns:
+        list: One dict per result present in both runs, regressions flagged.
+    """
+    before, after = flatten(baseline["results"]), flatten(current["results"])
+    changes = []
+    for path in sorted(before.keys() & after.keys()):
+        if not before[path]:
+            continue
+        change = (after[path] - before[path]) / before[path] * 100
+        worse = change if path.endswith("_ms") else -change
+        changes.append({
+            "metric": path,
+            "baseline": before[path],
+            "current": after[path],
+            "change_percent": round(change, 1),
+            "regression": worse > threshold and not path.endswith(UNGATED),
+        })
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("benchmarks", nargs="*", help=f"Benchmarks to run, all by default: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--spotify-latency", type=float, default=0.05, help="Seconds per Spotify API call")
+    parser.add_argument("--ytdl-latency", type=float, default=0.3, help="Seconds per yt-dlp extraction")
+    parser.add_argument("--plays", type=int, default=20, help="/play commands per phase")
+    parser.add_argument("--playlist-length", type=int, default=200)
+    parser.add_argument("--add-songs", type=int, default=50, help="Spotify links in one /add")
+    parser.add_argument("--queue-length", type=int, default=10_000)
+    parser.add_argument("--queue-ops", type=int, default=20_000, help="Repetitions of each queue operation")
+    parser.add_argument("--queue-commands", type=int, default=200, help="/queue commands")
+    parser.add_argument("--track-changes", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - BENCHMARKS.keys()
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    logging.disable(logging.INFO)  # Per-command log lines would be measured too
+    use_fake_audio()
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        results[name] = asyncio.run(BENCHMARKS[name](args))
+
+    report = {
+        "benchmark": "pipeline",
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(json.load(f), report)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if any(change["regression"] for change in report.get("comparison", ())):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Write-behind queue persistence: the cost of a flush, and whether queues survive a restart.
+
+Runs QueueManager against the SQLite store and against the Redis store backed
+by ``FakeRedis``. Bursts of changes across many guilds are flushed in one
+batch, and a second flush writes only the guilds changed since. Then the
+manager is closed and a fresh one restores from the same store; the
+restored queues and playing songs must match what was saved.
+Results are printed as JSON, and the run exits with status 1 on a mismatch.
+
+Run from the repository root:
+    python -m benchmarks.queue_store [--guilds 500] [--changes 20000]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeRedis
+from benchmarks.pipeline import make_track
+from modules.queue_manager import QueueManager
+from modules.queue_store import RedisQueueStore, SQLiteQueueStore
+
+
+def saved_state(queue_manager):
+    """Queues and playing songs of every guild, as plain data to compare."""
+    return {
+        "queues": {guild_id: [song.to_dict() for song in queue] for guild_id, queue in queue_manager.queues.items() if queue},
+        "current": {guild_id: (song.to_dict(), channel_id) for guild_id, (song, channel_id) in queue_manager.current.items()},
+    }
+
+
+async def check_store(make_store, args):
+    """Change, flush and close one manager, then restore a second one from the same store."""
+    rng = random.Random(args.seed)
+    store = make_store()
+    batches = []
+    write_batch = store.write_batch
+
+    async def counting_write_batch(states):
+        batches.append(len(states))
+        await write_batch(states)
+
+    store.write_batch = counting_write_batch
+    queue_manager = QueueManager(store, flush_interval=3600, max_length=0)  # Flushed by hand below
+    await queue_manager.restore()
+    for index in range(args.changes):
+        guild_id = rng.randrange(args.guilds)
+        action = rng.random()
+        if action < 0.7 or not queue_manager.queues.get(guild_id):
+            queue_manager.add_to_queue(guild_id, make_track(index))
+        elif action < 0.85:
+            queue_manager.pop_from_queue(guild_id)
+        else:
+            length = len(queue_manager.get_queue(guild_id))
+            queue_manager.move(guild_id, rng.randrange(length), rng.randrange(length))
+    for guild_id in range(0, args.guilds, 10):
+        queue_manager.set_current(guild_id, make_track(-guild_id), channel_id=guild_id * 10)
+
+    started = time.perf_counter()
+    await queue_manager.flush()
+    flush_seconds = time.perf_counter() - started
+    cleared = max(queue_manager.queues, key=lambda guild_id: len(queue_manager.queues[guild_id]))
+    queue_manager.clear_queue(cleared)  # A cleared guild must be deleted from the store
+    queue_manager.add_to_queue(args.guilds, make_track(args.changes))
+    await queue_manager.flush()  # Writes only the two guilds changed since the last flush
+    expected = saved_state(queue_manager)
+    await queue_manager.close()
+
+    restored_manager = QueueManager(make_store(), flush_interval=3600, max_length=0)
+    await restored_manager.restore()
+    restored = {
+        "queues": {guild_id: [song.to_dict() for song in queue] for guild_id, queue in restored_manager.queues.items() if queue},
+        "current": {guild_id: (song.to_dict(), channel_id) for guild_id, (song, _, channel_id) in restored_manager.restored.items()},
+    }
+    await restored_manager.close()
+    return {
+        "changes": args.changes,
+        "guilds_written": batches[0],
+        "flush_ms": round(flush_seconds * 1000, 3),
+        "guilds_rewritten": batches[1],
+        "restored_ok": restored == expected,
+    }
+
+
+async def run(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "queues.sqlite3")
+        results["sqlite"] = await check_store(lambda: SQLiteQueueStore(path), args)
+    redis_client = FakeRedis()
+    results["redis"] = await check_store(lambda: RedisQueueStore(client=redis_client), args)
+    results["redis"]["transactions"] = redis_client.transactions
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--guilds", type=int, default=500)
+    parser.add_argument("--changes", type=int, default=20_000, help="Queue changes made before the flush")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2))
+    if not all(result["restored_ok"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
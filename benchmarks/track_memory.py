@@ -0,0 +1,75 @@
+"""
+Per-song memory of queued songs: plain dicts versus Track.
+
+Queues 100k songs across 1k guilds through QueueManager, once as the dicts
+the cogs used to build and once as Tracks, and reports the bytes allocated per
+queued song. Artist names are rebuilt for every song, the way decoding API
+responses produces a fresh string each time, so interning shows up.
+
+Run from the repository root:
+    python -m benchmarks.track_memory [--songs N] [--guilds N]
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from operator import itemgetter
+
+from modules.indexed_queue import IndexedQueue
+from modules.queue_manager import QueueManager, song_duration
+from modules.track import Track
+
+ARTISTS = 2000  # Distinct artists in the generated catalogue
+
+
+def song_fields(rng, index):
+    """Fields of one generated song, with freshly allocated strings."""
+    artist = "".join(["Artist ", str(rng.randrange(ARTISTS))])
+    return (
+        f"Song title number {index}",
+        artist,
+        f"{index:011d}",
+        f"https://i.scdn.co/image/{rng.getrandbits(80):020x}",
+        rng.randrange(90, 420),
+    )
+
+
+def make_dict(title, artist, video_id, thumbnail, duration):
+    return {"title": title, "artist": artist, "video_id": video_id, "thumbnail": thumbnail, "duration": duration}
+
+
+def measure(factory, weight, songs, guilds, seed):
+    """Queue ``songs`` songs built by ``factory`` and return the bytes they hold."""
+    rng = random.Random(seed)
+    gc.collect()
+    tracemalloc.start()
+    queue_manager = QueueManager()
+    for guild_id in range(guilds):
+        # The same queues QueueManager builds, weighted by a duration each song shape can provide
+        queue_manager.queues[guild_id] = IndexedQueue(weight=weight)
+    for index in range(songs):
+        queue_manager.add_to_queue(index % guilds, factory(*song_fields(rng, index)))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue_manager
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--songs", type=int, default=100_000)
+    parser.add_argument("--guilds", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {"songs": args.songs, "guilds": args.guilds}
+    for name, factory, weight in (("dict", make_dict, itemgetter("duration")), ("track", Track, song_duration)):
+        total = measure(factory, weight, args.songs, args.guilds, args.seed)
+        results[name] = {"total_bytes": total, "bytes_per_song": round(total / args.songs, 1)}
+    results["saved_percent"] = round(100 * (1 - results["track"]["total_bytes"] / results["dict"]["total_bytes"]), 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
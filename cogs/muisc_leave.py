@@ -14,6 +14,8 @@ class LeaveCog(commands.Cog):
         try:
             voice_client = interaction.guild.voice_client
             if voice_client:
+                self.bot.PlaylistIngestor.cancel(interaction.guild.id)  # It would wait forever for queue space
+                self.bot.PlaybackScheduler.get_player(interaction.guild.id).stop()
                 await voice_client.disconnect()
                 await interaction.response.send_message("Disconnected from the voice channel.")
                 logger.info("Disconnected from voice channel.")
@@ -1,5 +1,5 @@
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 import logging
 from discord import app_commands
 
@@ -8,53 +8,8 @@ logger = logging.getLogger(__name__)
 class NextCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.is_playing = {}
         self.queue_manager = bot.QueueManager
-        self.background_task.before_loop(self.before_background_task)
-        self.background_task.start()
-
-    async def play_next(self, guild_id, voice_client):
-        next_song = self.queue_manager.pop_from_queue(guild_id)
-        if not next_song:
-            self.is_playing[guild_id] = False
-            logger.info(f"Queue is empty for guild {guild_id}. Stopping playback.")
-            return
-
-        self.is_playing[guild_id] = True
-        try:
-            logger.info(f"Attempting to play: {next_song['title']} for guild {guild_id}.")
-            voice_client.play(
-                discord.FFmpegPCMAudio(next_song['audio_url'], options="-vn"),
-                after=lambda e: self.bot.loop.create_task(self._on_song_end(guild_id, voice_client))
-            )
-
-            # Generate and send embed
-            embed = discord.Embed(
-                title="Now Playing",
-                description=f"[{next_song['title']}]({next_song['audio_url']})",
-                color=discord.Color.green()
-            )
-            if next_song.get('thumbnail'):
-                embed.set_thumbnail(url=next_song['thumbnail'])
-            embed.add_field(name="Artist", value=next_song['artist'], inline=True)
-            embed.add_field(name="Duration", value=f"{next_song['duration'] // 60}:{next_song['duration'] % 60:02}", inline=True)
-
-            # Send embed with bot's `MusicControlView`
-            if hasattr(self.bot, "MusicControlView"):
-                view = self.bot.MusicControlView(self, voice_client)
-                await voice_client.channel.send(embed=embed, view=view)
-            else:
-                logger.warning("MusicControlView not set as a bot attribute. Embed sent without controls.")
-                await voice_client.channel.send(embed=embed)
-
-        except Exception as e:
-            logger.error(f"Error playing next song for guild {guild_id}: {e}")
-            self.is_playing[guild_id] = False
-
-    async def _on_song_end(self, guild_id, voice_client):
-        logger.info(f"Song ended for guild {guild_id}. Attempting to play next.")
-        if guild_id in self.is_playing and self.is_playing[guild_id]:
-            await self.play_next(guild_id, voice_client)
+        self.scheduler = bot.PlaybackScheduler
 
     @app_commands.command(name="next", description="Skip to the next song in the queue.")
     async def next_song(self, interaction: discord.Interaction):
@@ -72,39 +27,23 @@ class NextCog(commands.Cog):
                 logger.info(f"No songs in queue for guild {guild_id}.")
                 return
 
-            if voice_client.is_playing():
-                voice_client.stop()
+            player = self.scheduler.get_player(guild_id)
+            if player.is_active():
                 await interaction.response.send_message("Skipping to the next song.", ephemeral=True)
-                logger.info(f"Stopped current song for guild {guild_id}, skipping to next.")
+                logger.info(f"Stopping current song for guild {guild_id}, skipping to next.")
             else:
-                logger.info(f"No song currently playing in guild {guild_id}. Playing next manually.")
-                await self.play_next(guild_id, voice_client)
                 await interaction.response.send_message("Playing the next song in the queue.", ephemeral=True)
+                logger.info(f"No song currently playing in guild {guild_id}. Playing next manually.")
+            if await player.skip():
+                await player.announce()
 
             logger.info(f"/next command executed successfully for guild {guild_id}.")
         except Exception as e:
-            await interaction.response.send_message("An error occurred while skipping the song.", ephemeral=True)
-            logger.error(f"Failed to skip song in guild {guild_id}: {e}")
-
-    @tasks.loop(seconds=5)
-    async def background_task(self):
-        for guild in self.bot.guilds:
-            guild_id = guild.id
-            voice_client = guild.voice_client
-
-            if not voice_client or not voice_client.is_connected():
-                continue
-
-            if not voice_client.is_playing() and self.queue_manager.is_queue_available(guild_id):
-                logger.info(f"Background task: No song playing in guild {guild_id}, starting next song.")
-                await self.play_next(guild_id, voice_client)
-
-    @background_task.before_loop
-    async def before_background_task(self):
-        await self.bot.wait_until_ready()
-
-    def cog_unload(self):
-        self.background_task.cancel()
+            if interaction.response.is_done():
+                await interaction.followup.send("An error occurred while skipping the song.", ephemeral=True)
+            else:
+                await interaction.response.send_message("An error occurred while skipping the song.", ephemeral=True)
+            logger.error(f"Failed to skip song in guild {interaction.guild_id}: {e}")
 
-async def setup(bot): 
+async def setup(bot):
     await bot.add_cog(NextCog(bot))
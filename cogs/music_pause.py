@@ -21,8 +21,7 @@ class PauseResumeCog(commands.Cog):
                 logger.warning(f"Bot is not connected to a voice channel in guild {guild_id}.")
                 return
 
-            if voice_client.is_playing():
-                voice_client.pause()
+            if self.bot.PlaybackScheduler.get_player(guild_id).pause():
                 await interaction.response.send_message("Playback paused.")
                 logger.info(f"Playback paused for guild {guild_id}.")
             else:
@@ -44,8 +43,7 @@ class PauseResumeCog(commands.Cog):
                 logger.warning(f"Bot is not connected to a voice channel in guild {guild_id}.")
                 return
 
-            if voice_client.is_paused():
-                voice_client.resume()
+            if self.bot.PlaybackScheduler.get_player(guild_id).resume():
                 await interaction.response.send_message("Playback resumed.")
                 logger.info(f"Playback resumed for guild {guild_id}.")
             else:
@@ -1,168 +1,24 @@
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
-import yt_dlp as youtube_dl
+from discord.ext import commands
 import logging
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyClientCredentials
-from decouple import config
-import re
-import asyncio
+import time
+from modules.guild_player import now_playing_embed
+from modules.metrics import TIME_TO_FIRST_AUDIO_SECONDS
+from modules.track import Track
+from modules.track_resolver import SPOTIFY_ALBUM_REGEX, SPOTIFY_PLAYLIST_REGEX, SPOTIFY_TRACK_REGEX, YOUTUBE_VIDEO_REGEX
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# YouTube downloader configuration
-ytdl_format_options = {
-    'format': 'bestaudio[ext=m4a]/bestaudio/best',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '192',  # Increased from 128 for better audio quality
-    }],
-    'buffersize': 1024 * 1024 * 10,  # 10MB buffer
-    'retries': 3,  # Add retry mechanism
-    'fragment_retries': 3,  # Retry fragmented downloads
-    'socket_timeout': 15,  # Increase socket timeout
-    'source_address': '0.0.0.0',  # Bind to all network interfaces
-    'no_color': True,
-    'ignoreerrors': False,  # Be strict about errors
-    'no_warnings': True,
-    'quiet': True,
-}
-
-ffmpeg_options = {
-    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',  # Added reconnection options
-    'options': '-vn -err_detect ignore_err',  # Added error detection ignore
-}
-
-ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
-
-SPOTIFY_TRACK_REGEX = re.compile(r"https?://open\.spotify\.com/track/([a-zA-Z0-9]+)")
-YOUTUBE_VIDEO_REGEX = re.compile(r"https?://(www\.)?(youtube\.com|youtu\.be)/(watch\?v=)?([a-zA-Z0-9_-]+)")
-SPOTIFY_PLAYLIST_REGEX = re.compile(r"https?://open\.spotify\.com/playlist/([a-zA-Z0-9]+)")
-
-# Spotify API setup
-def get_spotify_client():
-    """Initialize and return the Spotify client using credentials."""
-    SPOT_CLIENT_ID = config("SPOT_CLIENT_ID", default=None)
-    SPOT_SECRET = config("SPOT_SECRET", default=None)
-
-    client_credentials_manager = SpotifyClientCredentials(
-        client_id=SPOT_CLIENT_ID,
-        client_secret=SPOT_SECRET
-    )
-    spotify = Spotify(client_credentials_manager=client_credentials_manager)
-    return spotify
-
-async def search_song_on_spotify(spotify, query):
-    """Search for a song on Spotify using the provided query."""
-    try:
-        results = spotify.search(q=query, type="track", limit=1)
-        if results["tracks"]["items"]:
-            track = results["tracks"]["items"][0]
-            return {
-                "song_title": track["name"],
-                "artist_name": track["artists"][0]["name"],
-                "album_cover": track["album"]["images"][0]["url"] if track["album"]["images"] else None
-            }
-        else:
-            return None
-    except Exception as e:
-        logger.error(f"Error searching Spotify: {e}")
-        return None
-
-async def get_spotify_track_info(spotify, track_id):
-    """Get track information from Spotify using the track ID."""
-    try:
-        track = spotify.track(track_id)
-        return {
-            "song_title": track["name"],
-            "artist_name": track["artists"][0]["name"],
-            "album_cover": track["album"]["images"][0]["url"] if track["album"]["images"] else None
-        }
-    except Exception as e:
-        logger.error(f"Error fetching Spotify track info: {e}")
-        return None
-
-# Parses through the playlist a song at a time
-async def get_spotify_playlist_tracks(spotify, playlist_id):
-    """Get tracks from a Spotify playlist using the playlist ID."""
-    # Inshallah this works
-    try:
-        results = spotify.playlist_tracks(playlist_id)
-        tracks = []
-        for item in results['items']:
-            track = item['track']
-            tracks.append({
-                "song_title": track["name"],
-                "artist_name": track["artists"][0]["name"],
-                "album_cover": track["album"]["images"][0]["url"] if track["album"]["images"] else None
-            })
-        return tracks
-    except Exception as e:
-        logger.error(f"Error fetching Spotify playlist tracks: {e}")
-        return []
-
-async def get_youtube_video_info(video_id):
-    """Get video information from YouTube using the video ID."""
-    try:
-        info = ytdl.extract_info(video_id, download=False)
-        return {
-            "audio_url": info['url'],
-            "title": info['title'],
-            "duration": info['duration'],
-            "thumbnail": info.get('thumbnails', [{}])[-1].get('url', None)
-        }
-    except Exception as e:
-        logger.error(f"Error fetching YouTube video info: {e}")
-        return None
-
 class PlayCog(commands.Cog):
     """Cog for handling music playback commands."""
     def __init__(self, bot):
         self.bot = bot
-        self.spotify = get_spotify_client()
+        self.track_resolver = bot.TrackResolver
         self.queue_manager = bot.QueueManager
-        self.song_check_loop.start()
-
-    def cog_unload(self):
-        """Cleanup when the cog is unloaded."""
-        self.song_check_loop.cancel()
-
-    @tasks.loop(seconds=10)
-    async def song_check_loop(self):
-        """Periodic task to check and play the next song in the queue."""
-        for guild in self.bot.guilds:
-            voice_client = guild.voice_client
-            if voice_client and not voice_client.is_playing() and not voice_client.is_paused():
-                logger.info("No song is currently playing. Checking queue.")
-                next_song = self.queue_manager.pop_from_queue(guild.id)
-                if next_song:
-                    try:
-                        voice_client.play(
-                            discord.FFmpegPCMAudio(next_song['audio_url'], **ffmpeg_options),
-                            after=lambda e: logger.info(f"Finished playing: {next_song['title']}") if not e else logger.error(f"Error during playback: {e}")
-                        )
-
-                        # Prepare and send embed message
-                        embed = discord.Embed(
-                            title="Now Playing",
-                            description=f"[{next_song['title']}]({next_song['audio_url']})",
-                            color=discord.Color.green()
-                        )
-                        if next_song['thumbnail']:
-                            embed.set_thumbnail(url=next_song['thumbnail'])
-                        embed.add_field(name="Artist", value=next_song['artist'], inline=True)
-                        embed.add_field(name="Duration", value=f"{next_song['duration'] // 60}:{next_song['duration'] % 60:02}", inline=True)
-
-                        # Use MusicControlView from bot attribute
-                        view = self.bot.MusicControlView(self, voice_client)
-                        await voice_client.channel.send(embed=embed, view=view)
-
-                        logger.info(f"Playing next song: {next_song['title']} by {next_song['artist']}")
-                    except Exception as e:
-                        logger.error(f"Failed to play next song: {e}")
+        self.playlist_ingestor = bot.PlaylistIngestor
+        self.scheduler = bot.PlaybackScheduler
 
     async def join_voice_channel(self, interaction: discord.Interaction):
         """Join the voice channel that the user is currently in."""
@@ -182,61 +38,16 @@ class PlayCog(commands.Cog):
             await interaction.followup.send("You are not connected to a voice channel.", ephemeral=True)
             return None
 
-    async def skip_song(self, interaction: discord.Interaction, voice_client: discord.VoiceClient):
-        """Skip the current song and play the next one in the queue."""
-        try:
-            guild_id = interaction.guild.id
-            next_song = self.queue_manager.pop_from_queue(guild_id)
-
-            if not next_song:
-                voice_client.stop()
-                await interaction.followup.send("Queue is empty. Stopping playback.")
-                return
-
-            voice_client.stop()
-            voice_client.play(
-                discord.FFmpegPCMAudio(next_song['audio_url'], **ffmpeg_options),
-                after=lambda e: logger.info(f"Finished playing: {next_song['title']}") if not e else logger.error(f"Error during playback: {e}")
-            )
-
-            # Prepare and send embed message
-            embed = discord.Embed(
-                title="Now Playing",
-                description=f"**[{next_song['title']}]({next_song['audio_url']})**",
-                color=discord.Color.green()
-            )  
-            
-            if next_song['thumbnail']:
-                embed.set_thumbnail(url=next_song['thumbnail'])
-            embed.add_field(name="Artist", value=next_song['artist'], inline=True)
-            embed.add_field(name="Duration", value=f"{next_song['duration'] // 60}:{next_song['duration'] % 60:02}", inline=True)
-
-            # Use MusicControlView from bot attribute
-            view = self.bot.MusicControlView(self, voice_client)
-            await interaction.followup.send(embed=embed, view=view)
-            logger.info(f"Skipped to: {next_song['title']} by {next_song['artist']}")
-        except Exception as e:
-            await interaction.followup.send("An error occurred while skipping the song.")
-            logger.error(f"Failed to skip song: {e}")
-
-    async def search_youtube_audio(self, query):
-        """Search for audio on YouTube using the provided query."""
-        try:
-            info = ytdl.extract_info(f"ytsearch:{query}", download=False)
-            if 'entries' in info and info['entries']:
-                video = info['entries'][0]
-                return {
-                    "audio_url": video['url'],
-                    "title": video['title'],
-                    "duration": video['duration'],
-                    "thumbnail": video.get('thumbnails', [{}])[-1].get('url', None)
-                }
-            else:
-                logger.error("No results found for the query.")
-                return None
-        except Exception as e:
-            logger.error(f"Error extracting YouTube audio: {e}")
-            return None
+    async def start_playback(self, interaction: discord.Interaction):
+        """Start the queue if the guild's player is idle and announce the song in the channel."""
+        player = self.scheduler.get_player(interaction.guild.id)
+        next_song = await player.play_next(announce=False)
+        if next_song:
+            started_at = interaction.extras.get("started_at")
+            if started_at is not None:
+                TIME_TO_FIRST_AUDIO_SECONDS.observe(time.monotonic() - started_at)
+            view = self.bot.MusicControlView(player)
+            await interaction.followup.send(embed=now_playing_embed(next_song), view=view)
 
     @app_commands.command(name="play", description="Play music from a YouTube search query or a Spotify/YouTube link.")
     async def play(self, interaction: discord.Interaction, query: str):
@@ -247,55 +58,55 @@ class PlayCog(commands.Cog):
             if not voice_client:
                 return
 
+            if self.queue_manager.is_queue_full(interaction.guild.id):
+                await interaction.followup.send("The queue is full. Remove some songs before adding more.")
+                return
+
             spotify_playlist_match = SPOTIFY_PLAYLIST_REGEX.match(query)
+            spotify_album_match = SPOTIFY_ALBUM_REGEX.match(query)
             spotify_match = SPOTIFY_TRACK_REGEX.match(query)
             youtube_match = YOUTUBE_VIDEO_REGEX.match(query)
 
             spotify_data = None  # Initialize spotify_data to avoid referencing before assignment
 
-            if spotify_playlist_match:
-                playlist_id = spotify_playlist_match.group(1)
-                tracks = await get_spotify_playlist_tracks(self.spotify, playlist_id)
-                if not tracks:
-                    await interaction.followup.send("Could not find the Spotify playlist.")
+            if spotify_playlist_match or spotify_album_match:
+                # Tracks are streamed page by page, later pages load while the first song plays
+                if spotify_playlist_match:
+                    tracks = self.track_resolver.iter_spotify_playlist_tracks(spotify_playlist_match.group(1))
+                else:
+                    tracks = self.track_resolver.iter_spotify_album_tracks(spotify_album_match.group(1))
+                first_track = await anext(tracks, None)
+                if not first_track:
+                    await interaction.followup.send("Could not find the Spotify playlist or album.")
                     return
 
                 # Play the first song in the playlist
-                first_track = tracks.pop(0)
-                audio_data = await self.search_youtube_audio(first_track["song_title"] + " " + first_track["artist_name"] + " official audio")
-                if not audio_data:
+                first_song = await self.playlist_ingestor.resolve(first_track)
+                if not first_song:
+                    await tracks.aclose()
                     await interaction.followup.send("Could not find the first song in the playlist.")
                     return
 
-                self.queue_manager.add_to_queue(
-                    interaction.guild.id,
-                    {
-                        "title": first_track["song_title"],
-                        "artist": first_track["artist_name"],
-                        "audio_url": audio_data["audio_url"],
-                        "thumbnail": first_track["album_cover"] or audio_data["thumbnail"],
-                        "duration": audio_data["duration"]
-                    }
-                )
+                self.queue_manager.add_to_queue(interaction.guild.id, first_song)
 
-                if not voice_client.is_playing():
-                    await self.skip_song(interaction, voice_client)
+                await self.start_playback(interaction)
 
                 await interaction.followup.send(f"Playing first song in the playlist: **{first_track['song_title']}** by **{first_track['artist_name']}**")
 
-                # Periodically add the remaining songs to the queue
-                for track in tracks:
-                    await self.add_song_to_queue(interaction.guild.id, track)
+                # Resolve and queue the remaining songs in the background
+                self.playlist_ingestor.start(interaction.guild.id, tracks)
+                await interaction.followup.send("Queuing the rest of the playlist in the background.")
+                return
             elif spotify_match:
                 track_id = spotify_match.group(1)
-                spotify_data = await get_spotify_track_info(self.spotify, track_id)
+                spotify_data = await self.track_resolver.get_spotify_track_info(track_id)
                 if not spotify_data:
                     await interaction.followup.send("Could not find the Spotify track.")
                     return
-                audio_data = await self.search_youtube_audio(spotify_data["song_title"] + " " + spotify_data["artist_name"] + " official audio")
+                audio_data = await self.track_resolver.search_youtube_audio(spotify_data["song_title"] + " " + spotify_data["artist_name"] + " official audio")
             elif youtube_match:
                 video_id = youtube_match.group(4)
-                audio_data = await get_youtube_video_info(video_id)
+                audio_data = await self.track_resolver.get_youtube_video_info(video_id)
                 if not audio_data:
                     await interaction.followup.send("Could not find the YouTube video.")
                     return
@@ -305,11 +116,12 @@ class PlayCog(commands.Cog):
                     "album_cover": audio_data["thumbnail"]
                 }
             else:
-                spotify_data = await search_song_on_spotify(self.spotify, query)
-                spotify_title = spotify_data["song_title"] if spotify_data else query
-                spotify_artist = spotify_data["artist_name"] if spotify_data else "Unknown Artist"
-                spotify_thumbnail = spotify_data["album_cover"] if spotify_data else None
-                audio_data = await self.search_youtube_audio(spotify_title + " " + spotify_artist + " official audio")
+                spotify_data = await self.track_resolver.search_song_on_spotify(query) or {
+                    "song_title": query,
+                    "artist_name": "Unknown Artist",
+                    "album_cover": None
+                }
+                audio_data = await self.track_resolver.search_youtube_audio(spotify_data["song_title"] + " " + spotify_data["artist_name"] + " official audio")
 
             if not audio_data:
                 await interaction.followup.send("Could not find the song.")
@@ -317,46 +129,22 @@ class PlayCog(commands.Cog):
 
             self.queue_manager.add_to_queue(
                 interaction.guild.id,
-                {
-                    "title": spotify_data["song_title"],
-                    "artist": spotify_data["artist_name"],
-                    "audio_url": audio_data["audio_url"],
-                    "thumbnail": spotify_data["album_cover"] or audio_data["thumbnail"],
-                    "duration": audio_data["duration"]
-                }
+                Track(
+                    spotify_data["song_title"],
+                    spotify_data["artist_name"],
+                    audio_data["video_id"],
+                    spotify_data["album_cover"] or audio_data["thumbnail"],
+                    audio_data["duration"]
+                )
             )
 
-            if not voice_client.is_playing():
-                await self.skip_song(interaction, voice_client)
+            await self.start_playback(interaction)
 
             await interaction.followup.send("Song added to the queue.")
         except Exception as e:
             await interaction.followup.send("An error occurred while trying to play the song.")
             logger.error(f"Failed to play song: {e}")
 
-    async def add_song_to_queue(self, guild_id, track):
-        """Add a song to the queue periodically."""
-        try:
-            await asyncio.sleep(10)  # Adjust the delay as needed
-            audio_data = await self.search_youtube_audio(track["song_title"] + " " + track["artist_name"] + " official audio")
-            if not audio_data:
-                logger.error(f"Could not find the song: {track['song_title']} by {track['artist_name']}")
-                return
-
-            self.queue_manager.add_to_queue(
-                guild_id,
-                {
-                    "title": track["song_title"],
-                    "artist": track["artist_name"],
-                    "audio_url": audio_data["audio_url"],
-                    "thumbnail": track["album_cover"] or audio_data["thumbnail"],
-                    "duration": audio_data["duration"]
-                }
-            )
-            logger.info(f"Added to queue: {track['song_title']} by {track['artist_name']}")
-        except Exception as e:
-            logger.error(f"Failed to add song to queue: {e}")
-
 async def setup(bot):
     """Set up the PlayCog for the bot."""
     await bot.add_cog(PlayCog(bot))
@@ -1,118 +1,150 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
-import yt_dlp as youtube_dl
 import logging
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyClientCredentials
+import re
 from decouple import config
+from modules.queue_view import QueueView
+from modules.track import Track
+from modules.track_resolver import SPOTIFY_TRACK_REGEX, YOUTUBE_VIDEO_REGEX
 
 logger = logging.getLogger(__name__)
 
-# YouTube downloader configuration
-ytdl_format_options = {
-    'format': 'bestaudio/best',
-    'postprocessors': [{
-        'key': 'FFmpegExtractAudio',
-        'preferredcodec': 'mp3',
-        'preferredquality': '320',
-    }],
-}
-ytdl = youtube_dl.YoutubeDL(ytdl_format_options)
-
-# Spotify API setup
-def get_spotify_client():
-    SPOT_CLIENT_ID = config("SPOT_CLIENT_ID", default=None)
-    SPOT_SECRET = config("SPOT_SECRET", default=None)
-
-    client_credentials_manager = SpotifyClientCredentials(
-        client_id=SPOT_CLIENT_ID,
-        client_secret=SPOT_SECRET
-    )
-    return Spotify(client_credentials_manager=client_credentials_manager)
-
-async def search_song_on_spotify(spotify, query):
-    try:
-        results = spotify.search(q=query, type="track", limit=1)
-        if results["tracks"]["items"]:
-            track = results["tracks"]["items"][0]
-            return {
-                "song_title": track["name"],
-                "artist_name": track["artists"][0]["name"],
-                "album_cover": track["album"]["images"][0]["url"] if track["album"]["images"] else None
-            }
-        else:
-            return None
-    except Exception as e:
-        logger.error(f"Error searching Spotify: {e}")
-        return None
+# Settings
+ADD_MAX_SONGS = int(config("ADD_MAX_SONGS", default=50))  # Songs one /add may queue
+
+QUERY_SEPARATOR_REGEX = re.compile(r"[\n;]+")
+LINK_REGEX = re.compile(r"https?://[^\s,]+")
+
+
+def split_queries(text):
+    """
+    Split the text of /add into one query per song.
+
+    Queries are separated by new lines or semicolons. A part made only of
+    links, such as a pasted list of Spotify URLs, adds every link.
+    """
+    queries = []
+    for part in QUERY_SEPARATOR_REGEX.split(text):
+        part = part.strip()
+        links = LINK_REGEX.findall(part)
+        if links and not LINK_REGEX.sub("", part).replace(",", "").strip():
+            queries.extend(links)
+        elif part:
+            queries.append(part)
+    return queries
 
 
 class QueueCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.spotify = get_spotify_client()
+        self.track_resolver = bot.TrackResolver
         self.queue_manager = bot.QueueManager
 
-    async def search_youtube_audio(self, query):
-        try:
-            info = ytdl.extract_info(f"ytsearch:{query}", download=False)['entries'][0]
-            return {
-                "audio_url": info['formats'][0]['url'], #More robust URL extraction
-                "title": info['title'],
-                "duration": info['duration'],
-                "thumbnail": info.get('thumbnails', [{}])[-1].get('url', None) #Safer thumbnail extraction
-            }
-        except Exception as e:
-            logger.error(f"Error searching YouTube: {e}")
+    async def resolve(self, query, spotify_tracks):
+        """
+        Find the song for one query of /add.
+
+        Args:
+            query (str): A search, or a Spotify track or YouTube video link.
+            spotify_tracks (dict): Spotify track data already fetched for the
+                command's Spotify links, by track ID.
+
+        Returns:
+            Track or None: The queue entry, or None if no video was found.
+        """
+        youtube_match = YOUTUBE_VIDEO_REGEX.match(query)
+        if youtube_match:
+            audio_data = await self.track_resolver.get_youtube_video_info(youtube_match.group(4))
+            if not audio_data:
+                return None
+            return Track(audio_data["title"], "Unknown Artist", audio_data["video_id"], audio_data["thumbnail"], audio_data["duration"])
+
+        spotify_match = SPOTIFY_TRACK_REGEX.match(query)
+        if spotify_match:
+            spotify_data = spotify_tracks.get(spotify_match.group(1))
+            if not spotify_data:
+                return None
+        else:
+            spotify_data = await self.track_resolver.search_song_on_spotify(query)
+        spotify_title = spotify_data["song_title"] if spotify_data else query
+        spotify_artist = spotify_data["artist_name"] if spotify_data else "Unknown Artist"
+
+        audio_data = await self.track_resolver.search_youtube_audio(spotify_title + " " + spotify_artist)
+        if not audio_data:
             return None
+        return Track(spotify_title, spotify_artist, audio_data["video_id"], audio_data["thumbnail"], audio_data["duration"])
 
-    @app_commands.command(name="add", description="Add a song to the queue.")
+    @app_commands.command(name="add", description="Add songs to the queue.")
+    @app_commands.describe(query="A search or link; separate several with semicolons, or paste a list of links.")
     async def add(self, interaction: discord.Interaction, query: str):
         try:
             await interaction.response.defer()
 
-            spotify_data = await search_song_on_spotify(self.spotify, query)
-            spotify_title = spotify_data["song_title"] if spotify_data else query
-            spotify_artist = spotify_data["artist_name"] if spotify_data else "Unknown Artist"
+            if self.queue_manager.is_queue_full(interaction.guild.id):
+                await interaction.followup.send("The queue is full. Remove some songs before adding more.")
+                return
 
-            audio_data = await self.search_youtube_audio(spotify_title + " " + spotify_artist)
-            if not audio_data:
+            queries = split_queries(query)[:ADD_MAX_SONGS]
+            if not queries:
                 await interaction.followup.send("Could not find the song.")
                 return
 
-            self.queue_manager.add_to_queue(
-                guild_id=interaction.guild.id,
-                song={
-                    "title": spotify_title,
-                    "artist": spotify_artist,
-                    "audio_url": audio_data["audio_url"],
-                    "thumbnail": audio_data["thumbnail"],
-                    "duration": audio_data["duration"]
-                }
-            )
-
-            await interaction.followup.send(f"Added to queue: **{spotify_title}** by **{spotify_artist}**")
-            logger.info(f"Added to queue: {spotify_title} for guild {interaction.guild.id}")
+            # Spotify links are looked up in batches, then the songs are found on YouTube a few at a time
+            track_ids = [match.group(1) for match in map(SPOTIFY_TRACK_REGEX.match, queries) if match]
+            spotify_tracks = dict(zip(track_ids, await self.track_resolver.get_spotify_tracks(track_ids))) if track_ids else {}
+            # No more lookups in flight than yt-dlp workers, so none waits in the pool long enough to time out
+            limit = asyncio.Semaphore(self.bot.YTDLResolver.max_workers)
+
+            async def resolve(q):
+                async with limit:
+                    return await self.resolve(q, spotify_tracks)
+
+            songs = await asyncio.gather(*map(resolve, queries))
+
+            added = []
+            full = False
+            for song in songs:
+                if song is None:
+                    continue
+                if not self.queue_manager.add_to_queue(interaction.guild.id, song):
+                    full = True
+                    break
+                added.append(song)
+
+            if len(queries) == 1:
+                if added:
+                    await interaction.followup.send(f"Added to queue: **{added[0].title}** by **{added[0].artist}**")
+                elif full:
+                    await interaction.followup.send("The queue is full. Remove some songs before adding more.")
+                else:
+                    await interaction.followup.send("Could not find the song.")
+            else:
+                message = f"Added {len(added)} of {len(queries)} songs to the queue."
+                if full:
+                    message += " The queue is full."
+                await interaction.followup.send(message)
+            logger.info(f"Added {len(added)} of {len(queries)} songs to the queue for guild {interaction.guild.id}")
+
+            # Start playback right away if the bot is connected but idle
+            if added:
+                await self.bot.PlaybackScheduler.advance(interaction.guild.id)
         except Exception as e:
             await interaction.followup.send("An error occurred while adding the song to the queue.")
             logger.error(f"Failed to add song to queue: {e}")
 
     @app_commands.command(name="queue", description="View the current song queue.")
-    async def view_queue(self, interaction: discord.Interaction):
+    @app_commands.describe(page="Page of the queue to show.")
+    async def view_queue(self, interaction: discord.Interaction, page: int = 1):
         try:
             guild_id = interaction.guild.id
-            queue = self.queue_manager.get_queue(guild_id)
-
-            if not queue:
+            if not self.queue_manager.is_queue_available(guild_id):
                 await interaction.response.send_message("The queue is empty.")
                 return
 
-            queue_display = "\n".join([
-                f"{i + 1}. **{song['title']}** by **{song['artist']}**"
-                for i, song in enumerate(queue)
-            ])
-            await interaction.response.send_message(f"Current Queue:\n{queue_display}")
+            embed, shown = self.bot.QueuePages.embed(guild_id, page - 1)
+            await interaction.response.send_message(embed=embed, view=QueueView(self.bot.QueuePages, guild_id, shown))
             logger.info(f"Displayed the current queue for guild {guild_id}")
         except Exception as e:
             await interaction.response.send_message("An error occurred while displaying the queue.")
@@ -122,7 +154,9 @@ class QueueCog(commands.Cog):
     async def clear_queue(self, interaction: discord.Interaction):
         try:
             guild_id = interaction.guild.id
+            self.bot.PlaylistIngestor.cancel(guild_id)
             self.queue_manager.clear_queue(guild_id)
+            self.bot.PlaybackScheduler.get_player(guild_id).discard_prewarm()
 
             await interaction.response.send_message("The queue has been cleared.")
             logger.info(f"Cleared the queue for guild {guild_id}")
@@ -130,6 +164,88 @@ class QueueCog(commands.Cog):
             await interaction.response.send_message("An error occurred while clearing the queue.")
             logger.error(f"Failed to clear queue: {e}")
 
+    @app_commands.command(name="remove", description="Remove a song from the queue.")
+    @app_commands.describe(position="Position of the song in the queue.")
+    async def remove(self, interaction: discord.Interaction, position: int):
+        try:
+            guild_id = interaction.guild.id
+            song = self.queue_manager.remove(guild_id, position - 1)
+            if not song:
+                await interaction.response.send_message(f"There is no song at position {position}.", ephemeral=True)
+                return
+
+            await interaction.response.send_message(f"Removed from queue: **{song.title}** by **{song.artist}**")
+            logger.info(f"Removed {song.title} at position {position} from the queue for guild {guild_id}")
+        except Exception as e:
+            await interaction.response.send_message("An error occurred while removing the song.")
+            logger.error(f"Failed to remove song from queue: {e}")
+
+    @app_commands.command(name="move", description="Move a song to another position in the queue.")
+    @app_commands.describe(source="Current position of the song.", destination="New position of the song.")
+    async def move(self, interaction: discord.Interaction, source: int, destination: int):
+        try:
+            guild_id = interaction.guild.id
+            song = self.queue_manager.move(guild_id, source - 1, destination - 1)
+            if not song:
+                await interaction.response.send_message("Both positions must be in the queue.", ephemeral=True)
+                return
+
+            await interaction.response.send_message(f"Moved **{song.title}** to position {destination}.")
+            logger.info(f"Moved {song.title} from {source} to {destination} in the queue for guild {guild_id}")
+        except Exception as e:
+            await interaction.response.send_message("An error occurred while moving the song.")
+            logger.error(f"Failed to move song in queue: {e}")
+
+    @app_commands.command(name="jump", description="Skip ahead to a song in the queue.")
+    @app_commands.describe(position="Position of the song to play.")
+    async def jump(self, interaction: discord.Interaction, position: int):
+        try:
+            guild_id = interaction.guild.id
+            dropped = self.queue_manager.jump(guild_id, position - 1)
+            if dropped is None:
+                await interaction.response.send_message(f"There is no song at position {position}.", ephemeral=True)
+                return
+
+            await interaction.response.send_message(f"Jumping to position {position}, skipped {dropped} songs.")
+            logger.info(f"Jumped to position {position} in the queue for guild {guild_id}")
+
+            # Play it now if the bot is in voice, otherwise it is simply next in line
+            voice_client = interaction.guild.voice_client
+            if voice_client and voice_client.is_connected():
+                player = self.bot.PlaybackScheduler.get_player(guild_id)
+                if await player.skip():
+                    await player.announce()
+        except Exception as e:
+            if interaction.response.is_done():
+                await interaction.followup.send("An error occurred while jumping to the song.")
+            else:
+                await interaction.response.send_message("An error occurred while jumping to the song.")
+            logger.error(f"Failed to jump in queue: {e}")
+
+    @app_commands.command(name="shuffle", description="Shuffle the song queue.")
+    async def shuffle(self, interaction: discord.Interaction):
+        try:
+            guild_id = interaction.guild.id
+            self.queue_manager.shuffle(guild_id)
+
+            await interaction.response.send_message("The queue has been shuffled.")
+            logger.info(f"Shuffled the queue for guild {guild_id}")
+        except Exception as e:
+            await interaction.response.send_message("An error occurred while shuffling the queue.")
+            logger.error(f"Failed to shuffle queue: {e}")
+
+    @app_commands.command(name="dedupe", description="Remove repeated songs from the queue.")
+    async def dedupe(self, interaction: discord.Interaction):
+        try:
+            guild_id = interaction.guild.id
+            removed = self.queue_manager.dedupe(guild_id)
+
+            await interaction.response.send_message(f"Removed {removed} repeated songs from the queue.")
+            logger.info(f"Removed {removed} duplicates from the queue for guild {guild_id}")
+        except Exception as e:
+            await interaction.response.send_message("An error occurred while removing repeated songs.")
+            logger.error(f"Failed to dedupe queue: {e}")
+
 
 async def setup(bot): 
     await bot.add_cog(QueueCog(bot)) 
\ No newline at end of file
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+import aiohttp
+from decouple import config
+
+from logs.log_config import LOG_FILE, setup_logging
+from modules.cluster_reporter import CLUSTER_REPORT_INTERVAL
+from modules.metrics import METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Settings
+DISCORD_TOKEN = config("DISCORD_TOKEN", default=None)
+SHARD_COUNT = int(config("SHARD_COUNT", default=0))  # Total shards, 0 asks Discord for the recommended count
+CLUSTER_COUNT = int(config("CLUSTER_COUNT", default=os.cpu_count() or 1))  # Processes the shards are split across
+CLUSTER_SHARDS = config("CLUSTER_SHARDS", default="")  # Explicit layout, e.g. "0,1,2;3,4;5"; overrides CLUSTER_COUNT
+CLUSTER_VOICE_WEIGHT = float(config("CLUSTER_VOICE_WEIGHT", default=50))  # Load of one voice connection, in guilds
+CLUSTER_IMBALANCE = float(config("CLUSTER_IMBALANCE", default=1.5))  # Busiest/average cluster load that triggers a suggestion
+CLUSTER_RESTART_DELAY = float(config("CLUSTER_RESTART_DELAY", default=5))  # Seconds before restarting a crashed cluster
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+async def fetch_recommended_shards(token):
+    """
+    Ask Discord how many shards the bot should run.
+
+    Returns:
+        int: The recommended shard count.
+    """
+    async with aiohttp.ClientSession() as session:
+        async with session.get(GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}"}) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+def split_shards(shard_count, cluster_count):
+    """Spread shards over clusters in contiguous, near-equal ranges."""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    size, extra = divmod(shard_count, cluster_count)
+    layout, start = [], 0
+    for cluster_id in range(cluster_count):
+        end = start + size + (cluster_id < extra)
+        layout.append(list(range(start, end)))
+        start = end
+    return layout
+
+
+def parse_layout(layout):
+    """Parse a ``CLUSTER_SHARDS`` string into a list of shard ID lists."""
+    return [[int(shard_id) for shard_id in cluster.split(",")] for cluster in layout.split(";") if cluster.strip()]
+
+
+def shard_load(shard):
+    """Weight a shard's guilds and voice connections into one load figure."""
+    return shard["guilds"] + CLUSTER_VOICE_WEIGHT * shard["voice"]
+
+
+def balance_shards(shard_loads, cluster_count):
+    """
+    Assign shards to clusters so their loads are as even as possible.
+
+    Greedy longest-processing-time: the heaviest shard goes to the least
+    loaded cluster, until every shard is placed.
+
+    Args:
+        shard_loads (dict): shard_id -> load.
+        cluster_count (int): Number of clusters.
+
+    Returns:
+        list: Sorted shard ID lists, one per cluster.
+    """
+    clusters = [[0.0, []] for _ in range(cluster_count)]
+    for shard_id, load in sorted(shard_loads.items(), key=lambda item: item[1], reverse=True):
+        cluster = min(clusters, key=lambda c: c[0])
+        cluster[0] += load
+        cluster[1].append(shard_id)
+    return [sorted(shard_ids) for _, shard_ids in clusters]
+
+
+def run_cluster(cluster_id, shard_ids, shard_count, conn):
+    """Entry point of a cluster process: run the bot for a subset of the shards."""
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    os.environ["SHARD_IDS"] = ",".join(map(str, shard_ids))
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()  # Keep a terminal Ctrl+C from reaching clusters directly; the launcher forwards one SIGINT
+    setup_logging(os.path.join(os.path.dirname(LOG_FILE), f"cluster-{cluster_id}.log"))  # Rotation needs one writer per file
+
+    import main  # Reads the shard settings above when the bot is built
+    from modules.cluster_reporter import ClusterReporter
+
+    main.bot.ClusterReporter = ClusterReporter(main.bot, cluster_id, conn)
+    main.bot.MetricsServer.port = METRICS_PORT + cluster_id  # One metrics endpoint per cluster; the setting was read at import
+    main.bot.run(main.DISCORD_TOKEN, log_handler=None)  # Logging is configured by setup_logging
+
+
+class Launcher:
+    """
+    Runs the bot's shards as a set of cluster processes.
+
+    Every cluster loads the same cogs; queues and resolved tracks are shared
+    through the queue store and resolve cache. Clusters report their load over
+    a pipe, and the launcher logs it with a suggested shard layout whenever one
+    cluster carries much more than the average. Crashed clusters are restarted.
+    """
+    def __init__(self, layout, shard_count):
+        self.layout = layout
+        self.shard_count = shard_count
+        self.processes = {}  # cluster_id -> Process
+        self.conns = {}  # cluster_id -> parent end of the report pipe
+        self.reports = {}  # cluster_id -> latest report
+        self._stopping = False
+        self._last_balance_check = 0.0
+        self._context = multiprocessing.get_context("spawn")
+
+    def start_cluster(self, cluster_id):
+        parent_conn, child_conn = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_cluster,
+            args=(cluster_id, self.layout[cluster_id], self.shard_count, child_conn),
+            name=f"apollo-cluster-{cluster_id}",
+        )
+        process.start()
+        child_conn.close()
+        self.processes[cluster_id] = process
+        self.conns[cluster_id] = parent_conn
+        logger.info(f"Started cluster {cluster_id} (pid {process.pid}) with shards {self.layout[cluster_id]}")
+
+    def run(self):
+        """Start every cluster and supervise them until interrupted."""
+        for cluster_id in range(len(self.layout)):
+            self.start_cluster(cluster_id)
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        try:
+            while not self._stopping:
+                self.poll()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def poll(self):
+        """Wait for reports or exits and handle them."""
+        by_handle = {conn: ("report", cluster_id) for cluster_id, conn in self.conns.items()}
+        by_handle.update({p.sentinel: ("exit", cluster_id) for cluster_id, p in self.processes.items()})
+        for handle in wait(list(by_handle), timeout=1):
+            kind, cluster_id = by_handle[handle]
+            if kind == "report":
+                try:
+                    self.on_report(self.conns[cluster_id].recv())
+                except (EOFError, OSError):
+                    pass  # The process is exiting; its sentinel follows
+            elif not self._stopping:
+                self.on_exit(cluster_id)
+
+    def on_report(self, report):
+        """Log a cluster's load and check the balance across clusters."""
+        self.reports[report["cluster_id"]] = report
+        shards = report["shards"]
+        cpu = f"{report['cpu'] * 100:.0f}%" if report["cpu"] is not None else "n/a"
+        logger.info(
+            f"Cluster {report['cluster_id']}: cpu {cpu}, {sum(s['guilds'] for s in shards.values())} guilds, "
+            f"{sum(s['voice'] for s in shards.values())} voice, {report['players']} players"
+        )
+        now = time.monotonic()
+        if len(self.reports) == len(self.layout) and now - self._last_balance_check >= CLUSTER_REPORT_INTERVAL:
+            self._last_balance_check = now  # Once per round of reports
+            self.check_balance()
+
+    def check_balance(self):
+        """Log a better shard layout when the busiest cluster is well above average."""
+        shard_loads = {}
+        cluster_loads = []
+        for report in self.reports.values():
+            loads = {int(shard_id): shard_load(shard) for shard_id, shard in report["shards"].items()}
+            shard_loads.update(loads)
+            cluster_loads.append(sum(loads.values()))
+        average = sum(cluster_loads) / len(cluster_loads)
+        if average and max(cluster_loads) / average > CLUSTER_IMBALANCE:
+            suggested = balance_shards(shard_loads, len(self.layout))
+            logger.warning(
+                f"Cluster loads are uneven ({', '.join(f'{load:.0f}' for load in cluster_loads)}). "
+                f"Suggested layout: CLUSTER_SHARDS=\"{';'.join(','.join(map(str, c)) for c in suggested)}\""
+            )
+
+    def on_exit(self, cluster_id):
+        """Restart a cluster that exited on its own."""
+        process = self.processes[cluster_id]
+        self.conns.pop(cluster_id).close()
+        logger.error(f"Cluster {cluster_id} exited with code {process.exitcode}, restarting in {CLUSTER_RESTART_DELAY}s")
+        time.sleep(CLUSTER_RESTART_DELAY)
+        self.start_cluster(cluster_id)
+
+    def stop(self):
+        """Ask every cluster to shut down cleanly, then kill any that do not."""
+        if self._stopping:
+            return
+        self._stopping = True
+        for process in self.processes.values():
+            if process.is_alive():
+                if os.name != "nt":
+                    os.kill(process.pid, signal.SIGINT)  # bot.run closes the bot, saving queues
+                else:
+                    process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+        logger.info("All clusters stopped.")
+
+
+if __name__ == '__main__':
+    setup_logging()
+    if CLUSTER_SHARDS:
+        layout = parse_layout(CLUSTER_SHARDS)
+        shard_count = SHARD_COUNT or max(shard_id for cluster in layout for shard_id in cluster) + 1
+    else:
+        shard_count = SHARD_COUNT or asyncio.run(fetch_recommended_shards(DISCORD_TOKEN))
+        layout = split_shards(shard_count, CLUSTER_COUNT)
+    logger.info(f"Launching {shard_count} shards in {len(layout)} clusters")
+    Launcher(layout, shard_count).run()
@@ -5,13 +5,35 @@ saved both to a file and output to the console for easy monitoring.
 
 The log configuration includes:
 - Custom formatting for different log levels (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-- Log storage in the 'logs' directory
-- Both console and file handlers for comprehensive logging
+- Log storage in the 'logs' directory, rotated by size and age and gzip-compressed
+- Both console and file handlers, run on a background thread behind a queue so
+  the event loop never waits on terminal or disk writes
+- An optional JSON output mode for log shippers
+- Rate limiting of repetitive DEBUG and INFO lines
 """
 
+import atexit
+import gzip
+import json
 import logging
-import logging.config
+import logging.handlers
 import os  # Import os for directory and path management
+import queue
+import shutil
+import threading
+import time
+
+from decouple import config
+
+# Settings
+LOG_LEVEL = config("LOG_LEVEL", default="DEBUG")  # Lowest level written anywhere
+LOG_FORMAT = config("LOG_FORMAT", default="text")  # "text" or "json" (one object per line)
+LOG_FILE = config("LOG_FILE", default="logs/app.log")
+LOG_MAX_BYTES = int(config("LOG_MAX_BYTES", default=10 * 1024 * 1024))  # Rotate once the file is this large, 0 disables
+LOG_ROTATE_SECONDS = int(config("LOG_ROTATE_SECONDS", default=86400))  # Rotate once the file is this old, 0 disables
+LOG_BACKUP_COUNT = int(config("LOG_BACKUP_COUNT", default=7))  # Compressed old files kept
+LOG_RATE_LIMIT = int(config("LOG_RATE_LIMIT", default=20))  # DEBUG/INFO lines per call site per window, 0 disables
+LOG_RATE_WINDOW = float(config("LOG_RATE_WINDOW", default=60))  # Seconds of one rate-limit window
 
 class CustomFormatter(logging.Formatter):
     """Custom Formatter without emojis to ensure compatibility across various systems."""
@@ -28,54 +50,167 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: "\x1b[41m" + fmt + reset,  # Red background for CRITICAL
     }
 
+    def __init__(self, color=True):
+        super().__init__(self.fmt)
+        # Build one formatter per level up front instead of one per record
+        self._formatters = {level: logging.Formatter(fmt) for level, fmt in self.FORMATS.items()} if color else {}
+
     def format(self, record):
         """Override the format method to apply custom formatting."""
-        log_fmt = self.FORMATS.get(record.levelno, self.fmt)  # Get the format for the log level
-        formatter = logging.Formatter(log_fmt)  # Apply the format
+        formatter = self._formatters.get(record.levelno)  # Get the formatter for the log level
+        if formatter is None:
+            return super().format(record)
         return formatter.format(record)
 
-# Ensure the logs directory exists
-log_dir = "logs"  # Directory where logs will be stored
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)  # Create the directory if it does not exist
-
-# Define the logging configuration
-LOGGING_CONFIG = {
-    'version': 1,
-    'disable_existing_loggers': False,  # Do not disable existing loggers
-    'formatters': {
-        'standard': {
-            '()': CustomFormatter,  # Use the custom formatter
-        },
-    },
-    'handlers': {
-        'console': {
-            'level': 'DEBUG',  # Log DEBUG and higher levels to the console
-            'class': 'logging.StreamHandler',  # Output logs to the console
-            'formatter': 'standard',  # Use the standard formatter
-        },
-        'file': {
-            'level': 'DEBUG',  # Log DEBUG and higher levels to the file
-            'class': 'logging.FileHandler',  # Save logs to a file
-            'filename': os.path.join(log_dir, 'app.log'),  # Log file path in the logs directory
-            'formatter': 'standard',  # Use the standard formatter
-            'encoding': 'utf-8'  # Use UTF-8 encoding for the log file
-        },
-    },
-    'loggers': {
-        '': {  # Root logger configuration
-            'handlers': ['console', 'file'],  # Use both console and file handlers
-            'level': 'DEBUG',  # Log DEBUG and higher levels
-            'propagate': True,  # Allow logs to propagate to other loggers
-        },
-        'discord': {  # Discord-specific logger configuration
-            'handlers': ['console', 'file'],  # Use both console and file handlers
-            'level': 'WARNING',  # Log WARNING and higher levels for the discord logger
-            'propagate': False,  # Do not propagate to other loggers
-        },
-    }
-}
+class JSONFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most ``rate`` DEBUG or INFO records from the same line of code through
+    per ``window`` seconds. The first record of the next window reports how many
+    were dropped. Warnings and errors always pass.
+    """
+
+    def __init__(self, rate=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW):
+        super().__init__()
+        self.rate = rate
+        self.window = window
+        self._lock = threading.Lock()  # Records also come from the audio player and worker threads
+        self._sites = {}  # (pathname, lineno) -> [window start, records let through, records dropped]
+
+    def filter(self, record):
+        if not self.rate or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                dropped = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+                return True
+            if site[1] < self.rate:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+class CompressingRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates when the file reaches ``maxBytes`` or has been written to for
+    ``interval`` seconds, whichever comes first, and gzips the rotated files.
+    """
+
+    def __init__(self, filename, maxBytes=0, interval=0, backupCount=0, encoding=None):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self.interval = interval
+        self.rollover_at = self._next_rollover()
+        self.namer = lambda name: name + ".gz"
+        self.rotator = self._compress
+
+    def _next_rollover(self):
+        return time.time() + self.interval if self.interval else None
+
+    @staticmethod
+    def _compress(source, destination):
+        with open(source, "rb") as f_in, gzip.open(destination, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and record.created >= self.rollover_at:
+            return os.path.exists(self.baseFilename)
+        return self.maxBytes > 0 and super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = self._next_rollover()
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler for a listener in the same process. Only the message arguments
+    are merged on the logging thread, so later changes to them do not show up;
+    formatting, tracebacks included, is left to the listener thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+_listener = None  # Writes queued records to the console and file on its own thread
+
+def setup_logging(log_file=None):
+    """
+    Apply the logging configuration.
+
+    Loggers only put records on a queue; a background listener formats and
+    writes them. Calling this again once logging is set up does nothing, so a
+    launcher can pick the file before the bot configures logging.
+
+    Args:
+        log_file (str): File to write to, defaults to ``LOG_FILE``.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_file = log_file or LOG_FILE
+
+    # Ensure the logs directory exists
+    log_dir = os.path.dirname(log_file)  # Directory where logs will be stored
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)  # Create the directory if it does not exist
+
+    if LOG_FORMAT == "json":
+        console_formatter = file_formatter = JSONFormatter()
+    else:
+        console_formatter = CustomFormatter()
+        file_formatter = CustomFormatter(color=False)
+
+    console = logging.StreamHandler()  # Output logs to the console
+    console.setFormatter(console_formatter)
+    file = CompressingRotatingFileHandler(
+        log_file,
+        maxBytes=LOG_MAX_BYTES,
+        interval=LOG_ROTATE_SECONDS,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8'  # Use UTF-8 encoding for the log file
+    )
+    file.setFormatter(file_formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = LocalQueueHandler(records)
+    queue_handler.addFilter(RateLimitFilter())  # Dropped records never reach the queue
+    _listener = logging.handlers.QueueListener(records, console, file)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    root = logging.getLogger()  # Root logger configuration
+    root.handlers[:] = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    discord_logger = logging.getLogger('discord')  # Discord-specific logger configuration
+    discord_logger.handlers[:] = [queue_handler]
+    discord_logger.setLevel(logging.WARNING)  # Log WARNING and higher levels for the discord logger
+    discord_logger.propagate = False  # Do not propagate to other loggers
 
-def setup_logging():
-    """Apply the logging configuration."""
-    logging.config.dictConfig(LOGGING_CONFIG)
+def stop_logging():
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
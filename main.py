@@ -1,11 +1,28 @@
+import asyncio
+import io
 import os
+import time
 import discord
 import logging  # Import logging
+from discord import app_commands
 from discord.ext import commands
 from decouple import config
 from logs.log_config import setup_logging  # Import the logging setup function
 from modules.queue_manager import QueueManager
+from modules.queue_store import create_queue_store
 from modules.music_control_view import MusicControlView
+from modules.queue_view import QueuePages
+from modules.ytdl_resolver import YTDLResolver
+from modules.spotify_client import SpotifyClient
+from modules.resolve_cache import ResolveCache
+from modules.audio_cache import AudioCache
+from modules.track_resolver import TrackResolver
+from modules.playlist_ingestor import PlaylistIngestor
+from modules.playback_scheduler import PlaybackScheduler
+from modules.idle_manager import IdleManager
+from modules.metrics import COG_LOAD_SECONDS, COMMAND_SECONDS, COMMANDS, MetricsServer
+from modules.loop_watchdog import LoopWatchdog
+from modules.profiler import PROFILE_MAX_SECONDS, folded_profile
 
 # Set up logging
 setup_logging()
@@ -15,32 +32,119 @@ logger = logging.getLogger(__name__)
 intents = discord.Intents.default()
 intents.message_content = True  # Enable privileged intent for reading message content
 
+# Sharding: launcher.py sets these for each cluster process
+SHARD_COUNT = int(config("SHARD_COUNT", default=0))  # Total shards across all clusters, 0 lets Discord decide
+SHARD_IDS = config("SHARD_IDS", default="")  # Comma-separated shards run by this process, empty runs all
+
+def record_command(interaction, command, status):
+    """Record the latency and outcome of a slash command started by ``ApolloTree.interaction_check``."""
+    name = command.qualified_name if command else "unknown"
+    started_at = interaction.extras.get("started_at")
+    if started_at is not None:
+        COMMAND_SECONDS.observe(time.monotonic() - started_at, command=name)
+    COMMANDS.inc(command=name, status=status)
+
+class ApolloTree(app_commands.CommandTree):
+    """Command tree that reloads a guild's evicted queue before any of its commands run and times every command."""
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.monotonic()
+        if interaction.guild_id:
+            await self.client.QueueManager.ensure_loaded(interaction.guild_id)
+            self.client.IdleManager.touch(interaction.guild_id)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        record_command(interaction, interaction.command, "error")
+        await super().on_error(interaction, error)
+
+class ApolloBot(commands.AutoShardedBot):
+    """Bot that restores saved queues on startup and releases the shared clients when it shuts down."""
+    def owns_guild(self, guild_id):
+        """Check whether a guild belongs to one of this process's shards."""
+        if not self.shard_ids or not self.shard_count:
+            return True
+        return (guild_id >> 22) % self.shard_count in self.shard_ids
+
+    async def setup_hook(self):
+        await self.QueueManager.restore(self.owns_guild)
+        await self.load_cogs()
+        self.IdleManager.start()
+        self.LoopWatchdog.start()
+        await self.MetricsServer.start()
+        if self.ClusterReporter:
+            self.ClusterReporter.start()
+
+    async def load_cogs(self, path="cogs"):
+        """Load every cog in ``path`` concurrently, once, before the bot logs in, and log how long each took."""
+        async def load(name):
+            started = time.perf_counter()
+            try:
+                await self.load_extension(f"{path}.{name}")
+            except Exception as e:
+                logger.error(f"Failed to load cog {name}: {e}")
+                return name, None
+            elapsed = time.perf_counter() - started
+            COG_LOAD_SECONDS.set(elapsed, cog=name)
+            return name, elapsed
+
+        started = time.perf_counter()
+        names = sorted(filename[:-3] for filename in os.listdir(f"./{path}") if filename.endswith(".py"))
+        timings = [(name, elapsed) for name, elapsed in await asyncio.gather(*map(load, names)) if elapsed is not None]
+        breakdown = ", ".join(f"{name} {elapsed * 1000:.1f}ms" for name, elapsed in sorted(timings, key=lambda item: -item[1]))
+        logger.info(f"Loaded {len(timings)}/{len(names)} cogs in {(time.perf_counter() - started) * 1000:.1f}ms: {breakdown}")
+
+    async def close(self):
+        await self.QueueManager.close()  # Saves queues and positions before playback stops
+        if self.ClusterReporter:
+            self.ClusterReporter.stop()
+        self.PlaybackScheduler.stop()
+        self.IdleManager.stop()
+        self.LoopWatchdog.stop()
+        await self.MetricsServer.stop()
+        await self.SpotifyClient.close()
+        await self.ResolveCache.close()
+        await self.AudioCache.close()
+        self.YTDLResolver.shutdown()
+        await super().close()
+
 # Initialize the bot with command prefix and intents
-bot = commands.Bot(command_prefix='$$', intents=intents)
+bot = ApolloBot(
+    command_prefix='$$',
+    intents=intents,
+    tree_cls=ApolloTree,
+    shard_count=SHARD_COUNT or None,
+    shard_ids=[int(shard_id) for shard_id in SHARD_IDS.split(",")] if SHARD_IDS else None,
+)
 
-queue_manager = QueueManager()
+queue_manager = QueueManager(create_queue_store())
 bot.QueueManager = queue_manager
+bot.YTDLResolver = YTDLResolver()
+bot.SpotifyClient = SpotifyClient()
+bot.ResolveCache = ResolveCache()
+bot.AudioCache = AudioCache()
+bot.TrackResolver = TrackResolver(bot.SpotifyClient, bot.YTDLResolver, bot.ResolveCache, bot.AudioCache)
+bot.PlaylistIngestor = PlaylistIngestor(bot.TrackResolver, queue_manager)
+bot.PlaybackScheduler = PlaybackScheduler(bot, queue_manager, bot.TrackResolver)
+bot.IdleManager = IdleManager(bot, queue_manager, bot.PlaybackScheduler)
 bot.MusicControlView = MusicControlView
+bot.QueuePages = QueuePages(queue_manager)
+bot.LoopWatchdog = LoopWatchdog()
+bot.MetricsServer = MetricsServer(bot)
+bot.ClusterReporter = None  # Set by launcher.py in sharded mode
 
 
 # Settings
 DISCORD_TOKEN = config("DISCORD_TOKEN", default=None)
 AUTHORIZED_USER_ID = 759228225271496756
 
-# Load the cogs from the cogs subfolder
-async def load_cogs():
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py'):
-            try:
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                logger.info(f"Loaded cog: {filename}")
-            except Exception as e:
-                logger.error(f"Failed to load cog {filename}: {e}")
-
 @bot.event
 async def on_ready():
     logger.info(f'Logged in as {bot.user.name} ({bot.user.id})')
-    await load_cogs()
+    await bot.PlaybackScheduler.resume_restored()
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    record_command(interaction, command, "ok")
 
 # AdminSync command to sync commands globally
 @bot.command(name='as', description="Sync bot commands globally")
@@ -58,6 +162,27 @@ async def adminsync(ctx):
         logger.error(f"Error syncing commands: {e}")
         await ctx.send(f"Error syncing commands: {e}")
 
+# Profile command to sample every thread's stack and return a flamegraph-ready profile
+@bot.command(name='profile', description="Profile the bot for a number of seconds")
+async def profile(ctx, seconds: float = 10):
+    if ctx.author.id != AUTHORIZED_USER_ID:
+        await ctx.send("You are not authorized to use this command.")
+        return
+
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+    await ctx.send(f"Profiling for {seconds:g} seconds...")
+    try:
+        data, samples = await asyncio.to_thread(folded_profile, seconds)
+        filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+        logger.info(f"Profiled for {seconds:g}s ({samples} samples).")
+        await ctx.send(
+            f"{samples} samples. Open in https://www.speedscope.app or render with flamegraph.pl.",
+            file=discord.File(io.BytesIO(data), filename=filename),
+        )
+    except Exception as e:
+        logger.error(f"Error profiling: {e}")
+        await ctx.send(f"Error profiling: {e}")
+
 # Handling unforeseen errors in commands
 @bot.event
 async def on_command_error(ctx, error):
@@ -69,7 +194,7 @@ async def on_command_error(ctx, error):
 # Runs the bot 
 if __name__ == '__main__':
     try:
-        bot.run(DISCORD_TOKEN)
+        bot.run(DISCORD_TOKEN, log_handler=None)  # Logging is configured by setup_logging
     except Exception as e:
         logger.critical(f'Failed to start bot: {e}')
 
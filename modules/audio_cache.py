@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import aiohttp
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Settings
+AUDIO_CACHE_ENABLED = config("AUDIO_CACHE_ENABLED", default=False, cast=bool)  # Keep hot tracks' audio on local disk
+AUDIO_CACHE_PATH = config("AUDIO_CACHE_PATH", default="dbs/audio_cache")  # Directory of cached audio files
+AUDIO_CACHE_MAX_BYTES = int(config("AUDIO_CACHE_MAX_BYTES", default=2 * 1024 ** 3))  # Total size budget
+AUDIO_CACHE_MAX_FILE_BYTES = int(config("AUDIO_CACHE_MAX_FILE_BYTES", default=25 * 1024 ** 2))  # Skip longer tracks
+AUDIO_CACHE_MIN_PLAYS = int(config("AUDIO_CACHE_MIN_PLAYS", default=2))  # Plays before a track is stored
+AUDIO_CACHE_FILLS = int(config("AUDIO_CACHE_FILLS", default=2))  # Downloads running at once
+
+CHUNK_SIZE = 10 * 1024 ** 2  # Range size per request; YouTube throttles single large requests
+WRITE_SIZE = 256 * 1024
+PLAY_COUNTS_SIZE = 10000  # Tracks whose play count is remembered for admission
+OPUS_SUFFIX = ".opus"  # Raw Opus/WebM stream, can be passed through
+OTHER_SUFFIX = ".audio"  # Any other codec, transcoded on playback
+PART_SUFFIX = ".part"
+STALE_PART_SECONDS = 3600  # Partial downloads this old were left by a crash; younger ones may belong to another cluster
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _remove_if_exists(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _touch(path):
+    """Mark a cached file as recently played, keeping the LRU order across restarts; False if it is gone."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class AudioCache:
+    """
+    Size-bounded directory of already-encoded audio for frequently played tracks.
+
+    A track is admitted once it has been played ``min_plays`` times; its stream
+    is then downloaded in the background while it plays. Files are written
+    under a temporary name and renamed into place, so a crash never leaves a
+    truncated file behind. When the byte budget is exceeded, the least recently
+    played files are evicted.
+    """
+    def __init__(self, path=AUDIO_CACHE_PATH, max_bytes=AUDIO_CACHE_MAX_BYTES, enabled=AUDIO_CACHE_ENABLED,
+                 min_plays=AUDIO_CACHE_MIN_PLAYS, max_file_bytes=AUDIO_CACHE_MAX_FILE_BYTES, fills=AUDIO_CACHE_FILLS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.min_plays = min_plays
+        self.max_file_bytes = max_file_bytes
+        self._entries = None  # video_id -> (file path, size), least recently played first
+        self._indexing = None  # Task scanning the directory on first use
+        self._size = 0
+        self._plays = OrderedDict()  # video_id -> play count, for admission
+        self._filling = {}  # video_id -> download task
+        self._fill_slots = asyncio.Semaphore(fills)
+        self._session = None
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.fill_failures = 0
+        self.evictions = 0
+
+    def _load(self):
+        """
+        Start indexing the files already on disk on first use.
+
+        Returns:
+            bool: True once the index is ready; until then the cache acts empty.
+        """
+        if self._entries is not None:
+            return True
+        if self._indexing is None:
+            self._indexing = asyncio.create_task(self._index())
+        return False
+
+    async def _index(self):
+        """Scan the cache directory on a worker thread, keeping the event loop free."""
+        try:
+            entries = await asyncio.to_thread(self._scan)
+        except Exception as e:
+            logger.error(f"Could not open audio cache at {self.path}, disabling it: {e}")
+            self.enabled = False
+            entries = OrderedDict()
+        self._entries = entries
+        self._size = sum(size for _, size in entries.values())
+        logger.info(f"Audio cache holds {len(self._entries)} tracks ({self._size / 1024 ** 2:.0f} MB)")
+
+    def _scan(self):
+        """List the cached files, oldest first, and remove stale partial downloads."""
+        os.makedirs(self.path, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(PART_SUFFIX):
+                if time.time() - entry.stat().st_mtime > STALE_PART_SECONDS:
+                    os.remove(entry.path)
+            elif entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, entry.path, stat.st_size))
+        return OrderedDict((os.path.splitext(name)[0], (path, size)) for _, name, path, size in sorted(files))
+
+    async def lookup(self, video_id):
+        """
+        Find a cached track and mark it as recently played.
+
+        Args:
+            video_id (str): The YouTube video ID.
+
+        Returns:
+            dict or None: ``audio_url`` (the local file), ``acodec`` and ``local``,
+            or None if the track is not cached.
+        """
+        if not self.enabled or not self._load():
+            return None
+        entry = self._entries.get(video_id)
+        if entry is None or not await asyncio.to_thread(_touch, entry[0]):
+            if entry is not None and self._entries.get(video_id) is entry:
+                self._forget(video_id)  # Deleted behind our back
+            self.misses += 1
+            return None
+        if video_id in self._entries:
+            self._entries.move_to_end(video_id)
+        self.hits += 1
+        return {
+            "audio_url": entry[0],
+            "acodec": "opus" if entry[0].endswith(OPUS_SUFFIX) else None,
+            "local": True,
+        }
+
+    def record_play(self, video_id, resolve_stream):
+        """
+        Count a play and start caching the track once it is played often enough.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            resolve_stream (callable): Coroutine function returning the track's
+                stream data, called only if a download starts.
+        """
+        if not self.enabled or not self._load():
+            return
+        if video_id in self._entries or video_id in self._filling:
+            return
+        plays = self._plays.pop(video_id, 0) + 1
+        self._plays[video_id] = plays
+        if len(self._plays) > PLAY_COUNTS_SIZE:
+            self._plays.popitem(last=False)
+        if plays < self.min_plays:
+            return
+        task = asyncio.create_task(self._fill(video_id, resolve_stream))
+        task.add_done_callback(lambda _: self._filling.pop(video_id, None))
+        self._filling[video_id] = task
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_read=30))
+        return self._session
+
+    async def _fill(self, video_id, resolve_stream):
+        """Download a track's stream to a temporary file, then rename it into the cache."""
+        async with self._fill_slots:
+            stream = await resolve_stream()
+            if not stream or stream.get("local"):
+                return
+            suffix = OPUS_SUFFIX if stream.get("acodec") == "opus" else OTHER_SUFFIX
+            final_path = os.path.join(self.path, video_id + suffix)
+            part_path = f"{final_path}.{os.getpid()}{PART_SUFFIX}"  # Unique when clusters share the directory
+            try:
+                size = await self._download(stream["audio_url"], part_path)
+                if size is None:
+                    logger.info(f"Not caching {video_id}: larger than {self.max_file_bytes} bytes")
+                    return
+                await asyncio.to_thread(os.replace, part_path, final_path)  # Atomic on the same filesystem
+            except Exception as e:
+                self.fill_failures += 1
+                logger.error(f"Failed to cache audio for {video_id}: {e}")
+                return
+            finally:
+                await asyncio.to_thread(_remove_if_exists, part_path)
+
+            self._entries[video_id] = (final_path, size)
+            self._size += size
+            self._plays.pop(video_id, None)
+            self.fills += 1
+            logger.info(f"Cached audio for {video_id} ({size / 1024 ** 2:.1f} MB)")
+            await self._evict()
+
+    async def _download(self, url, part_path):
+        """
+        Fetch a stream in ranged chunks into ``part_path``.
+
+        Returns:
+            int or None: The file size, or None if it exceeded ``max_file_bytes``.
+        """
+        session = self._get_session()
+        size = 0
+        f = await asyncio.to_thread(open, part_path, "wb")  # File I/O runs on worker threads, off the event loop
+        try:
+            while True:
+                headers = {"Range": f"bytes={size}-{size + CHUNK_SIZE - 1}"}
+                async with session.get(url, headers=headers) as response:
+                    response.raise_for_status()
+                    received = 0
+                    async for data in response.content.iter_chunked(WRITE_SIZE):
+                        await asyncio.to_thread(f.write, data)
+                        received += len(data)
+                        if size + received > self.max_file_bytes:
+                            return None
+                size += received
+                if received < CHUNK_SIZE or response.status != 206:
+                    break  # Last chunk, or the server ignored the range and sent everything
+            await asyncio.to_thread(_sync, f)
+        finally:
+            await asyncio.to_thread(f.close)
+        return size
+
+    async def _evict(self):
+        """Delete the least recently played files until the cache fits its budget."""
+        while self._size > self.max_bytes and self._entries:
+            video_id, (path, _) = next(iter(self._entries.items()))
+            try:
+                await asyncio.to_thread(os.remove, path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Still open for playback on platforms that lock open files; try again next fill
+                logger.warning(f"Could not evict {path}: {e}")
+                if video_id in self._entries:
+                    self._entries.move_to_end(video_id)
+                break
+            if video_id in self._entries:  # Another fill may have evicted it meanwhile
+                self._forget(video_id)
+                self.evictions += 1
+
+    def _forget(self, video_id):
+        _, size = self._entries.pop(video_id)
+        self._size -= size
+
+    def stats(self):
+        """
+        Return cache counters.
+
+        Returns:
+            dict: Hits, misses, fills, failed fills, evictions, stored tracks and bytes.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fills": self.fills,
+            "fill_failures": self.fill_failures,
+            "evictions": self.evictions,
+            "tracks": len(self._entries or ()),
+            "bytes": self._size,
+        }
+
+    async def close(self):
+        """Cancel running downloads and close the HTTP session."""
+        if self._indexing:
+            self._indexing.cancel()
+        for task in list(self._filling.values()):
+            task.cancel()
+        if self._session and not self._session.closed:
+            await self._session.close()
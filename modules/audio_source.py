@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+
+import discord
+from decouple import config
+
+from modules.metrics import FFMPEG_SPAWN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Settings
+AUDIO_MODE = config("AUDIO_MODE", default="opus")  # "opus" passes YouTube's Opus through, "pcm" always transcodes
+
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',  # Added reconnection options
+    'options': '-vn -err_detect ignore_err',  # Added error detection ignore
+}
+LOCAL_FFMPEG_OPTIONS = {
+    'options': FFMPEG_OPTIONS['options'],  # The reconnect options only apply to HTTP inputs
+}
+
+FRAME_SECONDS = 0.02  # Every read() returns one 20ms frame
+
+try:
+    CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+except (AttributeError, ValueError, OSError):
+    CLOCK_TICKS = None  # No /proc accounting on this platform
+
+
+def process_cpu_seconds(pid):
+    """
+    Return the user + system CPU time used so far by a process, from /proc.
+
+    Returns:
+        float or None: CPU seconds, or None where /proc is unavailable.
+    """
+    if CLOCK_TICKS is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()  # Skip "pid (comm)", comm may contain spaces
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class StreamCPUStats:
+    """Aggregates per-stream CPU cost so the passthrough and transcode paths can be compared."""
+    def __init__(self):
+        self._lock = threading.Lock()  # Sources report from the audio player threads
+        self._totals = {}  # mode -> [streams, ffmpeg seconds, player thread seconds, audio seconds]
+
+    def record(self, mode, ffmpeg_cpu, player_cpu, audio_seconds):
+        with self._lock:
+            totals = self._totals.setdefault(mode, [0, 0.0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += ffmpeg_cpu or 0.0
+            totals[2] += player_cpu
+            totals[3] += audio_seconds
+
+    def stats(self):
+        """
+        Return CPU totals per audio mode.
+
+        Returns:
+            dict: For each mode, the stream count, CPU seconds split between the
+            ffmpeg process and the player thread (Opus encoding), and CPU use as
+            a share of one core while audio plays.
+        """
+        with self._lock:
+            return {
+                mode: {
+                    "streams": streams,
+                    "ffmpeg_cpu": ffmpeg_cpu,
+                    "player_cpu": player_cpu,
+                    "audio_seconds": audio_seconds,
+                    "cpu_share": (ffmpeg_cpu + player_cpu) / audio_seconds if audio_seconds else 0.0,
+                }
+                for mode, (streams, ffmpeg_cpu, player_cpu, audio_seconds) in self._totals.items()
+            }
+
+
+stream_cpu_stats = StreamCPUStats()
+
+
+class _CPUTrackedSource:
+    """
+    Mixin measuring one stream's CPU cost: the ffmpeg process, read from /proc,
+    plus the audio player thread, which is where discord.py Opus-encodes PCM.
+    """
+    mode = None
+
+    def read(self):
+        if self._thread_cpu_start is None:
+            self._thread_cpu_start = time.thread_time()
+        data = super().read()
+        if data:
+            self._frames += 1
+        return data
+
+    def cleanup(self):
+        if not self._reported and self._thread_cpu_start is not None:
+            self._reported = True
+            process = getattr(self, "_process", None)
+            ffmpeg_cpu = process_cpu_seconds(process.pid) if process else None
+            player_cpu = time.thread_time() - self._thread_cpu_start  # cleanup runs on the player thread
+            audio_seconds = self._frames * FRAME_SECONDS
+            stream_cpu_stats.record(self.mode, ffmpeg_cpu, player_cpu, audio_seconds)
+            ffmpeg_text = f"{ffmpeg_cpu:.2f}s" if ffmpeg_cpu is not None else "n/a"
+            logger.info(f"Stream CPU ({self.mode}): ffmpeg {ffmpeg_text}, player thread {player_cpu:.2f}s for {audio_seconds:.0f}s of audio")
+        super().cleanup()
+
+
+class PassthroughOpusAudio(_CPUTrackedSource, discord.FFmpegOpusAudio):
+    """Remuxes an Opus stream with ``-c:a copy``: no decode in ffmpeg and no encode in-process."""
+    mode = "opus"
+
+    def __init__(self, source, **kwargs):
+        self._thread_cpu_start = None
+        self._frames = 0
+        self._reported = False
+        super().__init__(source, codec="copy", **kwargs)
+
+
+class TranscodedPCMAudio(_CPUTrackedSource, discord.FFmpegPCMAudio):
+    """Decodes to PCM in ffmpeg; discord.py then encodes every frame to Opus."""
+    mode = "pcm"
+
+    def __init__(self, source, **kwargs):
+        self._thread_cpu_start = None
+        self._frames = 0
+        self._reported = False
+        super().__init__(source, **kwargs)
+
+
+def create_source(stream, start_at=0.0):
+    """
+    Open the cheapest audio source for a resolved stream.
+
+    Opus streams are passed straight through in ``opus`` mode; anything else,
+    or every stream in ``pcm`` mode, is transcoded.
+
+    Args:
+        stream (dict): Resolved YouTube data with ``audio_url`` and ``acodec``,
+            flagged ``local`` when ``audio_url`` is a file in the audio cache.
+        start_at (float): Position in seconds to start playing from.
+
+    Returns:
+        discord.AudioSource: The source to hand to ``VoiceClient.play``.
+    """
+    options = LOCAL_FFMPEG_OPTIONS if stream.get("local") else FFMPEG_OPTIONS
+    if start_at > 0:
+        options = {**options, 'before_options': f"-ss {start_at:.1f} {options.get('before_options', '')}".strip()}
+    source_class = PassthroughOpusAudio if AUDIO_MODE == "opus" and stream.get("acodec") == "opus" else TranscodedPCMAudio
+    with FFMPEG_SPAWN_SECONDS.time(mode=source_class.mode):  # The constructor starts ffmpeg
+        return source_class(stream["audio_url"], **options)
@@ -0,0 +1,76 @@
+import logging
+import os
+import time
+
+from decouple import config
+from discord.ext import tasks
+
+from modules.audio_source import stream_cpu_stats
+
+logger = logging.getLogger(__name__)
+
+# Settings
+CLUSTER_REPORT_INTERVAL = int(config("CLUSTER_REPORT_INTERVAL", default=30))  # Seconds between load reports
+
+
+class ClusterReporter:
+    """
+    Sends a cluster's load to the launcher over a pipe, so shards can be rebalanced.
+
+    Each report has the cluster's CPU use since the previous report and, per
+    shard, its guild count, voice connections and gateway latency.
+    """
+    def __init__(self, bot, cluster_id, conn):
+        self.bot = bot
+        self.cluster_id = cluster_id
+        self.conn = conn
+        self._last_cpu = None  # (process time, wall time) at the previous report
+
+    def start(self):
+        self.report.start()
+
+    def stop(self):
+        self.report.cancel()
+
+    def build_report(self):
+        """
+        Collect the cluster's current load.
+
+        Returns:
+            dict: Cluster ID, PID, CPU share of one core and per-shard load.
+        """
+        shards = {shard_id: {"guilds": 0, "voice": 0, "latency": latency} for shard_id, latency in self.bot.latencies}
+        for guild in self.bot.guilds:
+            shards.setdefault(guild.shard_id, {"guilds": 0, "voice": 0, "latency": None})["guilds"] += 1
+        for voice_client in self.bot.voice_clients:
+            shard = shards.get(voice_client.guild.shard_id)
+            if shard:
+                shard["voice"] += 1
+
+        cpu, now = time.process_time(), time.monotonic()
+        cpu_share = None
+        if self._last_cpu:
+            cpu_share = (cpu - self._last_cpu[0]) / (now - self._last_cpu[1])
+        self._last_cpu = (cpu, now)
+
+        return {
+            "cluster_id": self.cluster_id,
+            "pid": os.getpid(),
+            "cpu": cpu_share,
+            "players": len(self.bot.PlaybackScheduler.active),
+            "streams": stream_cpu_stats.stats(),
+            "shards": shards,
+        }
+
+    @tasks.loop(seconds=CLUSTER_REPORT_INTERVAL)
+    async def report(self):
+        """Send a load report; the launcher reads it in its own process."""
+        try:
+            self.conn.send(self.build_report())
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.error(f"Cluster {self.cluster_id} lost its launcher pipe, stopping reports: {e}")
+            self.report.stop()
+
+    @report.before_loop
+    async def before_report(self):
+        await self.bot.wait_until_ready()
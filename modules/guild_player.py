@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import time
+
+import discord
+from decouple import config
+
+from modules.audio_source import create_source
+from modules.metrics import TRACK_START_SECONDS
+from modules.track_resolver import PREFETCH_AHEAD, YOUTUBE_WATCH_URL
+
+logger = logging.getLogger(__name__)
+
+# Settings
+PREWARM_ENABLED = config("PREWARM_ENABLED", default=False, cast=bool)  # Open the next song's source before the current one ends
+PREWARM_SECONDS = float(config("PREWARM_SECONDS", default=5))  # How long before the end to open it
+
+# Player states
+IDLE = "idle"
+LOADING = "loading"
+PLAYING = "playing"
+PAUSED = "paused"
+
+
+def now_playing_embed(song):
+    """Build the "Now Playing" embed for a queued song."""
+    embed = discord.Embed(
+        title="Now Playing",
+        description=f"**[{song.title}]({YOUTUBE_WATCH_URL.format(song.video_id)})**",
+        color=discord.Color.green()
+    )
+    if song.thumbnail:
+        embed.set_thumbnail(url=song.thumbnail)
+    embed.add_field(name="Artist", value=song.artist, inline=True)
+    embed.add_field(name="Duration", value=f"{song.duration // 60}:{song.duration % 60:02}", inline=True)
+    return embed
+
+
+class GuildPlayer:
+    """
+    Playback state machine for one guild: idle -> loading -> playing <-> paused.
+
+    Every track transition happens under the player's lock, so concurrent
+    commands, buttons and end-of-track events start exactly one ffmpeg process
+    per transition. Each started track gets a token; an end-of-track event for
+    a track that was already replaced is ignored.
+    """
+    def __init__(self, scheduler, guild_id):
+        self.scheduler = scheduler
+        self.bot = scheduler.bot
+        self.queue_manager = scheduler.queue_manager
+        self.track_resolver = scheduler.track_resolver
+        self.guild_id = guild_id
+        self.state = IDLE
+        self.current = None  # The song being played or paused
+        self._token = 0  # Identifies the track the voice client is playing
+        self._lock = asyncio.Lock()
+        self._elapsed = 0.0  # Seconds of the current song played before the last pause
+        self._resumed_at = None  # When the current song last started or resumed playing
+        self._prewarm_timer = None
+        self._prewarm_task = None
+        self._prewarmed = None  # (song, audio source) opened ahead of time for the next song
+
+    @property
+    def voice_client(self):
+        """The guild's voice client, or None if the bot is not in voice."""
+        guild = self.bot.get_guild(self.guild_id)
+        return guild.voice_client if guild else None
+
+    def is_active(self):
+        """Check whether a song is loading, playing or paused."""
+        return self.state != IDLE
+
+    async def play_next(self, announce=True):
+        """
+        Start the next queued song if nothing is playing.
+
+        Args:
+            announce (bool): Post a "Now Playing" message in the voice channel chat.
+
+        Returns:
+            Track or None: The song that started, or None if the player was busy or the queue empty.
+        """
+        async with self._lock:
+            if self.state != IDLE:
+                return None
+            song = await self._start_next()
+        if song and announce:
+            await self.announce()
+        return song
+
+    async def skip(self):
+        """
+        Stop the current song and start the next queued one.
+
+        Returns:
+            Track or None: The song that started, or None if the queue was empty.
+        """
+        async with self._lock:
+            self._halt()
+            return await self._start_next()
+
+    def stop(self):
+        """Stop playback without advancing; the queue is left as it is until a command starts it again."""
+        self._halt()
+        self.discard_prewarm()
+        self.scheduler.deactivate(self.guild_id)  # Otherwise the safety sweep would start the queue again
+
+    def pause(self):
+        """
+        Pause the current song.
+
+        Returns:
+            bool: True if a playing song was paused.
+        """
+        voice_client = self.voice_client
+        if self.state != PLAYING or not voice_client or not voice_client.is_playing():
+            return False
+        voice_client.pause()
+        self.state = PAUSED
+        self._elapsed += time.monotonic() - self._resumed_at
+        self._resumed_at = None
+        self._cancel_prewarm()
+        return True
+
+    def resume(self):
+        """
+        Resume the paused song.
+
+        Returns:
+            bool: True if a paused song was resumed.
+        """
+        voice_client = self.voice_client
+        if self.state != PAUSED or not voice_client or not voice_client.is_paused():
+            return False
+        voice_client.resume()
+        self.state = PLAYING
+        self._resumed_at = time.monotonic()
+        self._schedule_prewarm()
+        return True
+
+    async def resume_from(self, song, position):
+        """
+        Resume a song that was playing before a restart.
+
+        Args:
+            song (Track): The song that was playing.
+            position (float): Seconds into the song where it stopped.
+
+        Returns:
+            Track or None: The song that started, or None if the player was busy.
+        """
+        async with self._lock:
+            if self.state != IDLE:
+                return None
+            self.queue_manager.add_to_front(self.guild_id, song)
+            song = await self._start_next(start_at=position)
+        if song:
+            await self.announce()
+        return song
+
+    def position(self):
+        """Seconds played of the current song."""
+        if self._resumed_at is None:
+            return self._elapsed
+        return self._elapsed + time.monotonic() - self._resumed_at
+
+    async def on_track_end(self, token, error, ended_at=None):
+        """
+        Handle the end of a track, reported by the scheduler from the ``after`` callback.
+
+        Args:
+            token (int): The token of the track that ended.
+            error (Exception): The playback error, if any.
+            ended_at (float): ``time.monotonic()`` when the track ended, to measure the gap.
+        """
+        async with self._lock:
+            if token != self._token:
+                return  # The track was skipped or stopped, its replacement is already handled
+            self.state = IDLE
+            self.current = None
+            self.queue_manager.set_current(self.guild_id, None)
+            song = await self._start_next(ended_at)
+        if song:
+            await self.announce()
+
+    async def announce(self):
+        """Post the "Now Playing" message for the current song in the voice channel chat."""
+        voice_client = self.voice_client
+        if not self.current or not voice_client:
+            return
+        try:
+            view = self.bot.MusicControlView(self)
+            await voice_client.channel.send(embed=now_playing_embed(self.current), view=view)
+        except Exception as e:
+            logger.error(f"Failed to announce song in guild {self.guild_id}: {e}")
+
+    def _halt(self):
+        """Stop the voice client and forget the current track. Its ``after`` event will be ignored."""
+        self._token += 1
+        self.state = IDLE
+        self.current = None
+        self.queue_manager.set_current(self.guild_id, None)
+        self._cancel_prewarm()
+        voice_client = self.voice_client
+        if voice_client and (voice_client.is_playing() or voice_client.is_paused()):
+            voice_client.stop()
+
+    async def _start_next(self, ended_at=None, start_at=0.0):
+        """
+        Pop songs until one resolves, then play it. Must be called with the lock held.
+
+        ``start_at`` seeks into the first popped song only.
+        """
+        voice_client = self.voice_client
+        if not voice_client or not voice_client.is_connected():
+            self.scheduler.deactivate(self.guild_id)
+            self.discard_prewarm()
+            return None
+
+        self.state = LOADING
+        loading_started = time.monotonic()
+        token = self._token  # stop() does not take the lock; it bumps the token while a stream resolves
+        try:
+            while True:
+                song = self.queue_manager.pop_from_queue(self.guild_id)
+                if not song:
+                    self.state = IDLE
+                    self.discard_prewarm()
+                    return None
+                source = self._take_prewarmed(song)
+                prewarmed = source is not None
+                if prewarmed:
+                    break
+                stream = await self.track_resolver.get_stream(song)
+                if token != self._token:
+                    self.queue_manager.add_to_front(self.guild_id, song)  # Stopped meanwhile, leave the queue as it was
+                    return None
+                if stream:
+                    source = create_source(stream, start_at)
+                    break
+                logger.error(f"Could not resolve a stream for {song.title}, skipping it.")
+                start_at = 0.0
+
+            self._token += 1
+            voice_client.play(source, after=self.scheduler.make_after(self.guild_id, self._token, song.title))
+        except Exception as e:
+            logger.error(f"Failed to play next song in guild {self.guild_id}: {e}")
+            self.state = IDLE
+            return None
+
+        TRACK_START_SECONDS.observe(time.monotonic() - loading_started, prewarmed=prewarmed)
+        if ended_at is not None:
+            self.scheduler.record_gap(time.monotonic() - ended_at, prewarmed)
+        self.state = PLAYING
+        self.current = song
+        self.queue_manager.set_current(self.guild_id, song, voice_client.channel.id)
+        self._elapsed = start_at
+        self._resumed_at = time.monotonic()
+        self._schedule_prewarm()
+        self.scheduler.activate(self.guild_id)
+        logger.info(f"Playing next song: {song.title} by {song.artist} in guild {self.guild_id}")
+        self.track_resolver.record_play(song)
+        self.track_resolver.prefetch(self.queue_manager.peek(self.guild_id, PREFETCH_AHEAD))
+        return song
+
+    def _schedule_prewarm(self):
+        """Arrange for the next song's source to be opened shortly before the current one ends."""
+        self._cancel_prewarm()  # A timer left from the previous song would fire early
+        if not PREWARM_ENABLED or not self.current or not self.current.duration:
+            return
+        remaining = self.current.duration - self._elapsed - PREWARM_SECONDS
+        loop = asyncio.get_running_loop()
+        self._prewarm_timer = loop.call_later(max(0, remaining), self._start_prewarm)
+
+    def _start_prewarm(self):
+        """Timer callback that runs ``_prewarm`` as a task."""
+        self._prewarm_timer = None
+        self._prewarm_task = asyncio.create_task(self._prewarm())
+
+    def _cancel_prewarm(self):
+        """Cancel a pending pre-warm; a source that is already open is kept for ``_take_prewarmed``."""
+        if self._prewarm_timer:
+            self._prewarm_timer.cancel()
+            self._prewarm_timer = None
+        if self._prewarm_task:
+            self._prewarm_task.cancel()
+            self._prewarm_task = None
+
+    async def _prewarm(self):
+        """Open the audio source of the song at the head of the queue."""
+        upcoming = self.queue_manager.peek(self.guild_id, 1)
+        if not upcoming or (self._prewarmed and self._prewarmed[0] is upcoming[0]):
+            return
+        song = upcoming[0]
+        stream = await self.track_resolver.get_stream(song)
+        if not stream or self.queue_manager.peek(self.guild_id, 1)[:1] != [song]:
+            return  # Could not resolve it, or the queue changed meanwhile
+        self._close_prewarmed()
+        try:
+            self._prewarmed = (song, create_source(stream))
+            logger.debug(f"Pre-warmed {song.title} in guild {self.guild_id}")
+        except Exception as e:
+            logger.error(f"Failed to pre-warm {song.title} in guild {self.guild_id}: {e}")
+
+    def _take_prewarmed(self, song):
+        """Return the pre-warmed source if it belongs to ``song``, discarding it otherwise."""
+        if self._prewarmed and self._prewarmed[0] is song:
+            source = self._prewarmed[1]
+            self._prewarmed = None
+            return source
+        self.discard_prewarm()
+        return None
+
+    def discard_prewarm(self):
+        """Close a pre-warmed source that will not be played, e.g. after the queue was cleared."""
+        self._cancel_prewarm()
+        self._close_prewarmed()
+
+    def _close_prewarmed(self):
+        if self._prewarmed:
+            self._prewarmed[1].cleanup()  # Kills its ffmpeg process
+            self._prewarmed = None
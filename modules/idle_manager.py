@@ -0,0 +1,143 @@
+import logging
+import time
+
+from decouple import config
+from discord.ext import tasks
+
+from modules.guild_player import LOADING
+
+logger = logging.getLogger(__name__)
+
+# Settings
+VOICE_IDLE_TIMEOUT = int(config("VOICE_IDLE_TIMEOUT", default=300))  # Seconds alone or not playing before leaving voice
+GUILD_EVICT_TIMEOUT = int(config("GUILD_EVICT_TIMEOUT", default=1800))  # Seconds without activity before dropping state
+IDLE_SWEEP_INTERVAL = int(config("IDLE_SWEEP_INTERVAL", default=30))  # Seconds between idle checks
+
+
+class IdleManager:
+    """
+    Releases the resources of guilds nobody is using.
+
+    Voice clients that are alone in their channel, or have not played anything,
+    for ``voice_timeout`` seconds are disconnected, which ends their ffmpeg
+    process and UDP socket. Guilds with no voice connection and no queue
+    activity for ``evict_timeout`` seconds have their queue and player state
+    dropped from memory; queued songs are saved to the queue store first and
+    reloaded the next time a command is used in the guild.
+    """
+    def __init__(self, bot, queue_manager, scheduler, voice_timeout=VOICE_IDLE_TIMEOUT, evict_timeout=GUILD_EVICT_TIMEOUT):
+        self.bot = bot
+        self.queue_manager = queue_manager
+        self.scheduler = scheduler
+        self.voice_timeout = voice_timeout
+        self.evict_timeout = evict_timeout
+        self._voice_idle_since = {}  # guild_id -> when its voice client went idle or alone
+        self._last_active = {}  # guild_id -> when its state was last used
+        self._seen_versions = {}  # guild_id -> queue version at the last sweep
+        self.disconnects = 0
+        self.evictions = 0
+
+    def start(self):
+        self.sweep.start()
+
+    def stop(self):
+        self.sweep.cancel()
+
+    def touch(self, guild_id):
+        """
+        Record activity in a guild, postponing its eviction.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self._last_active[guild_id] = time.monotonic()
+
+    def stats(self):
+        """
+        Return counts of live and evicted guild state.
+
+        Returns:
+            dict: Guilds with a queue or player in memory, evicted guilds, voice
+            connections and the totals of idle disconnects and evictions.
+        """
+        return {
+            "live_guilds": len(set(self.queue_manager.queues) | set(self.scheduler.players)),
+            "evicted_guilds": len(self.queue_manager.evicted),
+            "voice_connections": len(self.bot.voice_clients),
+            "disconnects": self.disconnects,
+            "evictions": self.evictions,
+        }
+
+    @tasks.loop(seconds=IDLE_SWEEP_INTERVAL)
+    async def sweep(self):
+        """Disconnect idle voice clients, then evict guilds idle for long enough."""
+        now = time.monotonic()
+        voice_clients = list(self.bot.voice_clients)
+        for voice_client in voice_clients:
+            await self._check_voice(voice_client, now)
+        connected = {voice_client.guild.id for voice_client in voice_clients}
+        for guild_id in list(self._voice_idle_since):
+            if guild_id not in connected:
+                del self._voice_idle_since[guild_id]  # Left voice some other way
+
+        guild_ids = set(self.queue_manager.queues) | set(self.scheduler.players)
+        for guild_id in guild_ids:
+            version = self.queue_manager.version(guild_id)
+            if self._seen_versions.get(guild_id) != version or guild_id not in self._last_active:
+                self._seen_versions[guild_id] = version
+                self._last_active[guild_id] = now
+        for guild_id in guild_ids:
+            if now - self._last_active[guild_id] >= self.evict_timeout:
+                await self._evict(guild_id)
+
+        for state in (self._last_active, self._seen_versions):
+            for guild_id in list(state):
+                if guild_id not in guild_ids:
+                    del state[guild_id]
+
+    @sweep.before_loop
+    async def before_sweep(self):
+        await self.bot.wait_until_ready()
+
+    async def _check_voice(self, voice_client, now):
+        """Disconnect a voice client that has been alone or silent for ``voice_timeout``."""
+        guild_id = voice_client.guild.id
+        listeners = [member for member in voice_client.channel.members if not member.bot]
+        player = self.scheduler.players.get(guild_id)
+        playing = voice_client.is_playing() or (player is not None and player.state == LOADING)
+        if listeners and playing:
+            self._voice_idle_since.pop(guild_id, None)
+            self.touch(guild_id)
+            return
+
+        idle_since = self._voice_idle_since.setdefault(guild_id, now)
+        if now - idle_since < self.voice_timeout:
+            return
+        self._voice_idle_since.pop(guild_id, None)
+        reason = "alone in the channel" if not listeners else "not playing"
+        try:
+            self.bot.PlaylistIngestor.cancel(guild_id)  # It would wait forever for queue space, blocking eviction
+            if player:
+                player.stop()
+            await voice_client.disconnect()
+            self.scheduler.deactivate(guild_id)
+            self.disconnects += 1
+            logger.info(f"Left voice in guild {guild_id}: {reason} for {self.voice_timeout}s")
+        except Exception as e:
+            logger.error(f"Failed to leave idle voice channel in guild {guild_id}: {e}")
+
+    async def _evict(self, guild_id):
+        """Drop a guild's state unless it is still connected, playing or queuing a playlist."""
+        guild = self.bot.get_guild(guild_id)
+        if guild and guild.voice_client:
+            return
+        if self.bot.PlaylistIngestor.is_ingesting(guild_id):
+            return
+        if not await self.queue_manager.evict(guild_id):
+            return
+        self.scheduler.forget(guild_id)
+        self.bot.QueuePages.forget(guild_id)
+        self._last_active.pop(guild_id, None)
+        self._seen_versions.pop(guild_id, None)
+        self.evictions += 1
+        logger.debug(f"Evicted idle state of guild {guild_id}")
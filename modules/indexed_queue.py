@@ -0,0 +1,217 @@
+import random
+
+
+class _Node:
+    __slots__ = ("value", "priority", "size", "weight", "total", "left", "right")
+
+    def __init__(self, value, weight=0):
+        self.value = value
+        self.priority = random.random()
+        self.size = 1
+        self.weight = weight
+        self.total = weight
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _total(node):
+    return node.total if node else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    node.total = node.weight + _total(node.left) + _total(node.right)
+    return node
+
+
+def _split(node, count):
+    """Split a tree into its first ``count`` items and the rest."""
+    if node is None:
+        return None, None
+    if _size(node.left) >= count:
+        left, node.left = _split(node.left, count)
+        return left, _update(node)
+    node.right, right = _split(node.right, count - _size(node.left) - 1)
+    return _update(node), right
+
+
+def _merge(left, right):
+    """Concatenate two trees; every item of ``left`` comes first."""
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _no_weight(value):
+    return 0
+
+
+def _build(values, start, end, weight):
+    """Build a balanced tree over ``values[start:end]`` in O(n), keeping the heap order of priorities."""
+    if start >= end:
+        return None
+    middle = (start + end) // 2
+    node = _Node(values[middle], weight(values[middle]))
+    node.left = _build(values, start, middle, weight)
+    node.right = _build(values, middle + 1, end, weight)
+    node.priority = max(node.priority, node.left.priority if node.left else 0, node.right.priority if node.right else 0)
+    return _update(node)
+
+
+class IndexedQueue:
+    """
+    Sequence with O(log n) access, insertion and removal at any position.
+
+    An implicit treap: a randomised balanced tree ordered by position, where
+    every node knows the size of its subtree. Supports the ``deque`` methods
+    the queue used before, so the length is always O(1).
+
+    An optional ``weight`` function (e.g. a song's duration) is summed per
+    subtree as well, so ``total()`` is O(1) whatever was added or removed.
+    """
+    __slots__ = ("_root", "_weight")
+
+    def __init__(self, values=(), weight=None):
+        self._weight = weight or _no_weight
+        values = list(values)
+        self._root = _build(values, 0, len(values), self._weight)
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __bool__(self):
+        return self._root is not None
+
+    def __iter__(self):
+        return self.iter_range(0, len(self))
+
+    def __getitem__(self, index):
+        index = self._index(index)
+        node = self._root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.value
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def __repr__(self):
+        return f"IndexedQueue({list(self)!r})"
+
+    def total(self):
+        """Sum of the weights of every item."""
+        return _total(self._root)
+
+    def _index(self, index, length=None):
+        length = len(self) if length is None else length
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("queue index out of range")
+        return index
+
+    def iter_range(self, start, stop):
+        """
+        Iterate over the items from ``start`` up to ``stop`` in O(log n + k).
+
+        Args:
+            start (int): Index of the first item.
+            stop (int): Index after the last item.
+        """
+        stack, node, skip = [], self._root, max(0, start)
+        remaining = min(stop, len(self)) - skip
+        # Walk down to the start position, remembering the ancestors still to visit
+        while node is not None:
+            left_size = _size(node.left)
+            if skip < left_size:
+                stack.append(node)
+                node = node.left
+            elif skip == left_size:
+                stack.append(node)
+                break
+            else:
+                skip -= left_size + 1
+                node = node.right
+        while stack and remaining > 0:
+            node = stack.pop()
+            yield node.value
+            remaining -= 1
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def append(self, value):
+        self._root = _merge(self._root, _Node(value, self._weight(value)))
+
+    def appendleft(self, value):
+        self._root = _merge(_Node(value, self._weight(value)), self._root)
+
+    def insert(self, index, value):
+        """Insert ``value`` so that it ends up at ``index``."""
+        index = max(0, min(index, len(self)))
+        left, right = _split(self._root, index)
+        self._root = _merge(_merge(left, _Node(value, self._weight(value))), right)
+
+    def pop(self, index=-1):
+        """Remove and return the item at ``index``."""
+        index = self._index(index)
+        left, rest = _split(self._root, index)
+        node, right = _split(rest, 1)
+        self._root = _merge(left, right)
+        return node.value
+
+    def popleft(self):
+        if self._root is None:
+            raise IndexError("pop from an empty queue")
+        return self.pop(0)
+
+    def move(self, source, destination):
+        """
+        Move the item at ``source`` so that it ends up at ``destination``.
+
+        Returns:
+            The moved item.
+        """
+        length = len(self)
+        source = self._index(source, length)
+        destination = self._index(destination, length)
+        value = self.pop(source)
+        self.insert(destination, value)
+        return value
+
+    def drop_front(self, count):
+        """
+        Remove the first ``count`` items in O(log n).
+
+        Returns:
+            int: The number of items removed.
+        """
+        count = max(0, min(count, len(self)))
+        _, self._root = _split(self._root, count)
+        return count
+
+    def clear(self):
+        self._root = None
+
+    def replace(self, values):
+        """Replace every item with ``values`` in O(n)."""
+        values = list(values)
+        self._root = _build(values, 0, len(values), self._weight)
+
+    def shuffle(self, rng=random):
+        """Shuffle the items in place in O(n)."""
+        values = list(self)
+        rng.shuffle(values)
+        self.replace(values)
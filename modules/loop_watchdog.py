@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from decouple import config
+
+from modules.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+# Settings
+LOOP_HEARTBEAT_INTERVAL = float(config("LOOP_HEARTBEAT_INTERVAL", default=0.1))  # Seconds between loop heartbeats
+LOOP_STALL_THRESHOLD = float(config("LOOP_STALL_THRESHOLD", default=0.5))  # Seconds blocked before a stall is reported
+
+STALL_HISTORY = 20  # Recent stalls kept for stats()
+
+
+class LoopWatchdog:
+    """
+    Detects a blocked event loop and logs the stack of the code blocking it.
+
+    A heartbeat scheduled on the loop every ``interval`` seconds records how
+    late it ran, which is the loop's lag. A separate thread checks the last
+    heartbeat; once it is more than ``threshold`` seconds old, the loop is stuck
+    in synchronous code, and the thread captures the loop thread's current
+    stack while it is still inside that code.
+    """
+    def __init__(self, interval=LOOP_HEARTBEAT_INTERVAL, threshold=LOOP_STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = 0
+        self.recent = deque(maxlen=STALL_HISTORY)  # (when, seconds blocked, stack)
+        self._loop = None
+        self._loop_thread_id = None
+        self._handle = None
+        self._expected_at = None  # When the next heartbeat is due
+        self._last_beat = None
+        self._stall_stack = None  # Stack captured during the current stall
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the heartbeat and the watchdog thread; must be called from the event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._schedule()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self):
+        self._expected_at = time.monotonic() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _beat(self):
+        """Heartbeat callback on the loop: record the lag and report a stall that just ended."""
+        now = time.monotonic()
+        lag = max(0.0, now - self._expected_at)
+        LOOP_LAG_SECONDS.observe(lag)
+        if lag >= self.threshold:
+            self.stalls += 1
+            LOOP_STALLS.inc()
+            stack, self._stall_stack = self._stall_stack, None
+            self.recent.append((time.time(), lag, stack))
+            logger.warning(f"Event loop was blocked for {lag:.2f}s")  # The watchdog thread logged its stack
+        self._last_beat = now
+        self._schedule()
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack while it is blocked."""
+        while not self._stop.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._last_beat - self.interval
+            if blocked < self.threshold or self._stall_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._stall_stack = "".join(traceback.format_stack(frame))
+            # Reported now as well, in case the loop never recovers
+            logger.warning(f"Event loop blocked for {blocked:.2f}s so far, in:\n{self._stall_stack}")
+
+    def stats(self):
+        """
+        Return stall counts.
+
+        Returns:
+            dict: The number of stalls, and the duration of the longest recent one in seconds.
+        """
+        return {
+            "stalls": self.stalls,
+            "recent_max": max((seconds for _, seconds, _ in self.recent), default=0.0),
+        }
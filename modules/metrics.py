@@ -0,0 +1,315 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Settings
+METRICS_ENABLED = config("METRICS_ENABLED", default=True, cast=bool)  # Serve /metrics over HTTP
+METRICS_HOST = config("METRICS_HOST", default="127.0.0.1")  # Keep local; scrape through a proxy or SSH tunnel
+METRICS_PORT = int(config("METRICS_PORT", default=9102))  # Sharded clusters add their cluster ID
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _label_value(value):
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """A named metric with optional labels; every label combination is a separate series."""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # Some values are recorded from worker and audio threads
+        self._series = {}  # label values -> value
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(_label_value(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        """Drop every series, e.g. before a collector sets the current ones."""
+        with self._lock:
+            self._series.clear()
+
+    def remove(self, **labels):
+        """Drop the series of one label combination."""
+        with self._lock:
+            self._series.pop(self._key(labels), None)
+
+    def samples(self):
+        """Yield ``(name suffix, label values, extra labels, value)`` for every series."""
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in series:
+            yield "", key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. the number of commands run."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. the length of a queue."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into cumulative buckets, so quantiles such as p99 can be
+    computed by Prometheus with ``histogram_quantile``.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]  # Bucket counts, sum, count
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the ``with`` block took, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield "_bucket", key, (("le", _format_value(float(bound))),), cumulative
+            yield "_sum", key, (), total
+            yield "_count", key, (), count
+
+
+class MetricsRegistry:
+    """
+    Holds every metric of the process and renders them in the Prometheus text format.
+
+    Values that already live elsewhere, such as queue lengths or cache counters,
+    are copied into gauges by collectors that run on every scrape instead of
+    being updated on every change.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, cls, name, *args, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        """
+        Run a function before every scrape to refresh gauges.
+
+        Args:
+            collector (callable): Called with no arguments.
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """
+        Run the collectors and render every metric.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# Hot paths, recorded where they happen
+RESOLVE_SECONDS = metrics.histogram(
+    "apollo_resolve_seconds", "Latency of Spotify API calls and yt-dlp extractions.", ("source", "operation")
+)
+RESOLVE_ERRORS = metrics.counter(
+    "apollo_resolve_errors_total", "Failed Spotify API calls and yt-dlp extractions.", ("source", "operation")
+)
+FFMPEG_SPAWN_SECONDS = metrics.histogram(
+    "apollo_ffmpeg_spawn_seconds", "Time to start an ffmpeg process for an audio source.", ("mode",)
+)
+TRACK_START_SECONDS = metrics.histogram(
+    "apollo_track_start_seconds", "Time from popping a song to handing its audio to the voice client.", ("prewarmed",)
+)
+TRACK_GAP_SECONDS = metrics.histogram(
+    "apollo_track_gap_seconds", "Silence between the end of one track and the start of the next.", ("prewarmed",)
+)
+TIME_TO_FIRST_AUDIO_SECONDS = metrics.histogram(
+    "apollo_time_to_first_audio_seconds", "Time from /play to its song starting in an idle player."
+)
+COMMAND_SECONDS = metrics.histogram(
+    "apollo_command_seconds", "Time to handle a slash command.", ("command",)
+)
+COMMANDS = metrics.counter(
+    "apollo_commands_total", "Slash commands handled.", ("command", "status")
+)
+LOOP_LAG_SECONDS = metrics.histogram(
+    "apollo_event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up.", buckets=LOOP_LAG_BUCKETS
+)
+LOOP_STALLS = metrics.counter(
+    "apollo_event_loop_stalls_total", "Times the event loop was blocked longer than the stall threshold."
+)
+COG_LOAD_SECONDS = metrics.gauge(
+    "apollo_cog_load_seconds", "Time taken to load each cog at startup.", ("cog",)
+)
+
+
+class MetricsServer:
+    """
+    Serves ``/metrics`` for Prometheus.
+
+    Also registers the collectors that copy the bot's current state into gauges:
+    queue depth per guild, voice connections, players and the counters kept by
+    the resolver, caches and idle manager.
+    """
+    def __init__(self, bot, registry=metrics, host=METRICS_HOST, port=METRICS_PORT, enabled=METRICS_ENABLED):
+        self.bot = bot
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.enabled = enabled
+        self._runner = None
+        self.queue_length = registry.gauge("apollo_queue_length", "Songs queued per guild.", ("guild",))
+        self.queued_songs = registry.gauge("apollo_queued_songs", "Songs queued across every guild.")
+        self.voice_clients = registry.gauge("apollo_voice_clients", "Connected voice clients.")
+        self.players = registry.gauge("apollo_active_players", "Guilds with a song loading, playing or paused.")
+        self.component_stats = registry.gauge(
+            "apollo_component_stat", "Counters and sizes reported by the bot's components.", ("component", "stat")
+        )
+        registry.add_collector(self.collect)
+
+    async def start(self):
+        """Start the HTTP endpoint, if enabled."""
+        if not self.enabled:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+            logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        except OSError as e:
+            logger.error(f"Failed to serve metrics on {self.host}:{self.port}: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle_metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    def collect(self):
+        """Copy the bot's current state into gauges; runs on every scrape."""
+        queues = self.bot.QueueManager.queues
+        self.queue_length.clear()
+        for guild_id, queue in list(queues.items()):
+            if queue:
+                self.queue_length.set(len(queue), guild=guild_id)
+        self.queued_songs.set(sum(len(queue) for queue in list(queues.values())))
+        self.voice_clients.set(len(self.bot.voice_clients))
+        self.players.set(len(self.bot.PlaybackScheduler.active))
+
+        for component, stats in (
+            ("ytdl", self.bot.YTDLResolver.stats()),
+            ("track_resolver", self.bot.TrackResolver.stats()),
+            ("resolve_cache", self.bot.ResolveCache.stats()),
+            ("audio_cache", self.bot.AudioCache.stats()),
+            ("idle", self.bot.IdleManager.stats()),
+            ("loop", self.bot.LoopWatchdog.stats()),
+            ("queue_pages", {"hits": self.bot.QueuePages.hits, "misses": self.bot.QueuePages.misses}),
+        ):
+            for stat, value in stats.items():
+                self.component_stats.set(value, component=component, stat=stat)
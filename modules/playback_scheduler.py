@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from decouple import config
+from discord.ext import tasks
+
+from modules.guild_player import GuildPlayer
+from modules.metrics import TRACK_GAP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Settings
+SAFETY_SWEEP_INTERVAL = int(config("SAFETY_SWEEP_INTERVAL", default=60))  # Seconds between idle-player checks
+
+
+class PlaybackScheduler:
+    """
+    Owns every guild's GuildPlayer and advances them when a song ends.
+
+    Playback is driven by the voice client's ``after`` callback rather than by
+    polling every guild. A slow safety sweep only visits guilds that have an
+    active player, in case an event was missed.
+    """
+    def __init__(self, bot, queue_manager, track_resolver):
+        self.bot = bot
+        self.queue_manager = queue_manager
+        self.track_resolver = track_resolver
+        self.players = {}  # guild_id -> GuildPlayer
+        self.active = set()  # IDs of guilds with a player
+        self._gaps = deque(maxlen=512)  # Recent (silence between tracks in seconds, pre-warmed)
+        queue_manager.position_provider = self.position_of
+
+    def get_player(self, guild_id):
+        """
+        Get the player for a guild, creating it if needed.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            GuildPlayer: The guild's player.
+        """
+        player = self.players.get(guild_id)
+        if player is None:
+            player = self.players[guild_id] = GuildPlayer(self, guild_id)
+        return player
+
+    def position_of(self, guild_id):
+        """
+        Get how far into its current song a guild is.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            float: Seconds played, 0 if the guild has no player.
+        """
+        player = self.players.get(guild_id)
+        return player.position() if player else 0.0
+
+    async def resume_restored(self):
+        """Rejoin voice and resume the songs that were playing before the bot restarted."""
+        restored, self.queue_manager.restored = self.queue_manager.restored, {}
+        for guild_id, (song, position, channel_id) in restored.items():
+            channel = self.bot.get_channel(channel_id) if channel_id else None
+            if channel is None:
+                logger.warning(f"Cannot resume {song.title} in guild {guild_id}: voice channel not found")
+                continue
+            try:
+                if channel.guild.voice_client is None:
+                    await channel.connect()
+                await self.get_player(guild_id).resume_from(song, position)
+                logger.info(f"Resumed {song.title} at {position:.0f}s in guild {guild_id}")
+            except Exception as e:
+                logger.error(f"Failed to resume playback in guild {guild_id}: {e}")
+
+    def make_after(self, guild_id, token, title):
+        """
+        Build an ``after`` callback for ``VoiceClient.play``.
+
+        discord.py calls it from the audio player thread, so it hands the event
+        over to the event loop thread-safely.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            token (int): The player's token for the track being started.
+            title (str): The title of the song being played, for logging.
+
+        Returns:
+            callable: The callback to pass as ``after``.
+        """
+        loop = asyncio.get_running_loop()
+
+        def after(error):
+            ended_at = time.monotonic()
+            if error:
+                logger.error(f"Error during playback of {title} in guild {guild_id}: {error}")
+            else:
+                logger.info(f"Finished playing: {title}")
+            asyncio.run_coroutine_threadsafe(self.get_player(guild_id).on_track_end(token, error, ended_at), loop)
+
+        return after
+
+    def activate(self, guild_id):
+        """
+        Mark a guild as having a player, so the safety sweep watches it.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self.active.add(guild_id)
+        if not self.safety_sweep.is_running():
+            self.safety_sweep.start()
+
+    def deactivate(self, guild_id):
+        """
+        Stop watching a guild, e.g. after it left voice.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        self.active.discard(guild_id)
+
+    def forget(self, guild_id):
+        """
+        Drop a guild's player, e.g. when its idle state is evicted.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        player = self.players.pop(guild_id, None)
+        if player:
+            player.discard_prewarm()
+        self.deactivate(guild_id)
+
+    async def advance(self, guild_id):
+        """
+        Start the next song if the guild's player is idle and has songs queued.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        if not self.queue_manager.is_queue_available(guild_id):
+            return
+        await self.get_player(guild_id).play_next()
+
+    def record_gap(self, gap, prewarmed):
+        """
+        Record the silence between the end of one track and the start of the next.
+
+        Args:
+            gap (float): Seconds between the ``after`` callback and the next ``play``.
+            prewarmed (bool): Whether the next track's source was pre-warmed.
+        """
+        self._gaps.append((gap, prewarmed))
+        TRACK_GAP_SECONDS.observe(gap, prewarmed=prewarmed)
+        logger.debug(f"Track change gap: {gap * 1000:.0f}ms ({'pre-warmed' if prewarmed else 'cold start'})")
+
+    def gap_stats(self):
+        """
+        Summarise recent inter-track gaps, split by pre-warmed and cold starts.
+
+        Returns:
+            dict: Sample count, average and maximum gap in seconds for each kind of start.
+        """
+        stats = {}
+        for name, prewarmed in (("prewarmed", True), ("cold", False)):
+            gaps = [gap for gap, warm in self._gaps if warm == prewarmed]
+            stats[name] = {
+                "count": len(gaps),
+                "avg": sum(gaps) / len(gaps) if gaps else 0.0,
+                "max": max(gaps, default=0.0),
+            }
+        return stats
+
+    @tasks.loop(seconds=SAFETY_SWEEP_INTERVAL)
+    async def safety_sweep(self):
+        """Catch players that went idle with songs still queued, e.g. after a failed start."""
+        for guild_id in list(self.active):
+            if not self.get_player(guild_id).voice_client:
+                self.deactivate(guild_id)  # Left voice
+                continue
+            await self.advance(guild_id)
+
+    def stop(self):
+        """Cancel the safety sweep."""
+        self.safety_sweep.cancel()
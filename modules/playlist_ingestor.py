@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from decouple import config
+
+from modules.track import Track
+
+logger = logging.getLogger(__name__)
+
+# Settings
+INGEST_CONCURRENCY = int(config("INGEST_CONCURRENCY", default=4))  # Playlist tracks resolved at once
+INGEST_MAX_AHEAD = int(config("INGEST_MAX_AHEAD", default=25))  # Queued songs ingestion may run ahead of playback
+
+
+async def _aiter(iterable):
+    """Adapt a plain iterable to the async iterator protocol."""
+    for item in iterable:
+        yield item
+
+
+class PlaylistIngestor:
+    """Resolves playlist tracks concurrently and queues them in playlist order."""
+    def __init__(self, track_resolver, queue_manager, concurrency=INGEST_CONCURRENCY, max_ahead=INGEST_MAX_AHEAD):
+        self.track_resolver = track_resolver
+        self.queue_manager = queue_manager
+        self.concurrency = concurrency
+        self.max_ahead = max_ahead
+        self._tasks = {}  # guild_id -> set of running ingestion tasks
+
+    async def resolve(self, track):
+        """
+        Find a Spotify track on YouTube and build its queue entry.
+
+        Args:
+            track (dict): Spotify track data from the TrackResolver.
+
+        Returns:
+            Track or None: The queue entry, or None if no video was found.
+        """
+        audio_data = await self.track_resolver.search_youtube_audio(track["song_title"] + " " + track["artist_name"] + " official audio")
+        if not audio_data:
+            logger.error(f"Could not find the song: {track['song_title']} by {track['artist_name']}")
+            return None
+        return Track(
+            track["song_title"],
+            track["artist_name"],
+            audio_data["video_id"],
+            track["album_cover"] or audio_data["thumbnail"],
+            audio_data["duration"]
+        )
+
+    async def ingest(self, guild_id, tracks):
+        """
+        Resolve and queue tracks for a guild.
+
+        Up to ``concurrency`` tracks are resolved at once, and each is queued as
+        soon as every track before it has been queued. No new lookup starts while
+        the guild's queue plus the lookups in flight would exceed ``max_ahead``.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            tracks (iterable or async iterable): Spotify track data, in playlist
+                order. Async iterables are consumed lazily, page by page.
+
+        Returns:
+            int: The number of songs added to the queue.
+        """
+        started = time.monotonic()
+        window = deque()  # Lookups in flight, oldest first
+        added = 0
+        tracks = tracks.__aiter__() if hasattr(tracks, "__aiter__") else _aiter(tracks)
+        try:
+            while True:
+                while len(window) < self.concurrency:
+                    track = await anext(tracks, None)
+                    if track is None:
+                        break
+                    await self.queue_manager.wait_for_space(guild_id, max(1, self.max_ahead - len(window)))
+                    window.append(asyncio.create_task(self.resolve(track)))
+                if not window:
+                    break
+
+                song = await window.popleft()
+                if song:
+                    if not self.queue_manager.add_to_queue(guild_id, song):
+                        logger.warning(f"Queue for guild {guild_id} is full, stopped queuing the playlist")
+                        break
+                    added += 1
+        finally:
+            for task in window:
+                task.cancel()
+            if hasattr(tracks, "aclose"):
+                await tracks.aclose()
+
+        logger.info(f"Queued {added} playlist songs for guild {guild_id} in {time.monotonic() - started:.1f}s")
+        return added
+
+    def start(self, guild_id, tracks):
+        """
+        Run ``ingest`` in the background.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            tracks (iterable or async iterable): Spotify track data, in playlist order.
+
+        Returns:
+            asyncio.Task: The ingestion task.
+        """
+        task = asyncio.create_task(self.ingest(guild_id, tracks))
+        tasks = self._tasks.setdefault(guild_id, set())
+        tasks.add(task)
+        task.add_done_callback(lambda t: self._finished(guild_id, t))
+        return task
+
+    def _finished(self, guild_id, task):
+        """Forget a finished task and surface any error it raised."""
+        tasks = self._tasks.get(guild_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._tasks[guild_id]
+        if not task.cancelled() and task.exception():
+            logger.error(f"Playlist ingestion failed for guild {guild_id}: {task.exception()}")
+
+    def is_ingesting(self, guild_id):
+        """Check whether a playlist is still being queued for a guild."""
+        return bool(self._tasks.get(guild_id))
+
+    def cancel(self, guild_id):
+        """
+        Stop queuing playlists for a guild, e.g. when its queue is cleared.
+
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        for task in list(self._tasks.get(guild_id, ())):
+            task.cancel()
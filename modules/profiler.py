@@ -0,0 +1,79 @@
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Settings
+PROFILE_INTERVAL = float(config("PROFILE_INTERVAL", default=0.005))  # Seconds between stack samples
+PROFILE_MAX_SECONDS = int(config("PROFILE_MAX_SECONDS", default=60))  # Longest profile the command may request
+
+
+@functools.lru_cache(maxsize=None)
+def _code_name(filename, name, firstlineno):
+    path = os.path.relpath(filename)
+    if path.startswith(".."):
+        path = filename  # Outside the bot's directory, e.g. the standard library
+    return f"{name} ({path}:{firstlineno})"
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return _code_name(code.co_filename, code.co_name, code.co_firstlineno)  # Cached, as the same code recurs in every sample
+
+
+def sample_stacks(seconds, interval=PROFILE_INTERVAL):
+    """
+    Sample the stack of every thread but this one for ``seconds``.
+
+    Blocks the calling thread, so run it with ``asyncio.to_thread``. Sampling
+    from a thread means the profile also shows time the event loop spends
+    inside synchronous calls, which a profiler running on the loop could not.
+
+    Args:
+        seconds (float): How long to sample for.
+        interval (float): Seconds between samples.
+
+    Returns:
+        tuple: A Counter of collapsed stacks, root first and prefixed by the
+        thread name, and the number of samples taken.
+    """
+    own_id = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_frame_name(frame))
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            stacks[";".join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+def folded_profile(seconds, interval=PROFILE_INTERVAL):
+    """
+    Profile the process and render it in the collapsed-stack format.
+
+    Each line is ``thread;outer;...;inner count``, which flamegraph.pl,
+    speedscope and inferno read directly.
+
+    Returns:
+        tuple: The profile as bytes, and the number of samples taken.
+    """
+    stacks, samples = sample_stacks(seconds, interval)
+    lines = [f"{stack} {count}" for stack, count in sorted(stacks.items())]
+    return ("\n".join(lines) + "\n").encode("utf-8"), samples
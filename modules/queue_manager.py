@@ -1,31 +1,130 @@
-from collections import deque
+import asyncio
+import logging
+import time
+
+from decouple import config
+
+from modules.indexed_queue import IndexedQueue
+from modules.queue_store import MemoryQueueStore
+from modules.track import Track
+
+logger = logging.getLogger(__name__)
+
+# Settings
+QUEUE_FLUSH_INTERVAL = float(config("QUEUE_FLUSH_INTERVAL", default=2))  # Seconds between batched queue writes
+QUEUE_CHECKPOINT_INTERVAL = float(config("QUEUE_CHECKPOINT_INTERVAL", default=15))  # Seconds between position saves
+QUEUE_MAX_LENGTH = int(config("QUEUE_MAX_LENGTH", default=1000))  # Songs a guild can queue, 0 for no limit
+
+def song_duration(song):
+    """Weight of a song in its guild's queue, summed for the total duration."""
+    return song.duration
+
 
 class QueueManager:
-    """Utility class to manage song queues for multiple guilds."""
-    def __init__(self):
+    """
+    Utility class to manage song queues for multiple guilds.
+
+    Queues live in memory. Changes only mark the guild as dirty; a background
+    task writes the dirty guilds to the store in one batch, so repeated changes
+    to a guild between flushes cost a single write.
+    """
+    def __init__(self, store=None, flush_interval=QUEUE_FLUSH_INTERVAL, checkpoint_interval=QUEUE_CHECKPOINT_INTERVAL,
+                 max_length=QUEUE_MAX_LENGTH):
         self.queues = {}  # Dictionary to hold queues for each guild
+        self.versions = {}  # guild_id -> counter bumped on every change to the queue
+        self.max_length = max_length
+        self._drained = {}  # Events set whenever songs leave a guild's queue
+        self.store = store or MemoryQueueStore()
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.current = {}  # guild_id -> (song being played, voice channel ID)
+        self.position_provider = None  # Callable returning a guild's playback position in seconds
+        self.restored = {}  # guild_id -> (song, position, channel ID) to resume after a restart
+        self.evicted = set()  # Guilds whose idle queue was saved and dropped from memory
+        self._loading = {}  # guild_id -> task reloading an evicted queue
+        self._dirty = set()
+        self._flusher = None
 
     def get_queue(self, guild_id):
         """
         Get the queue for a specific guild, or initialize it if it doesn't exist.
         
         Returns:
-            deque: The queue for the specified guild.
+            IndexedQueue: The queue for the specified guild.
         """
         if guild_id not in self.queues:
-            self.queues[guild_id] = deque()
+            self.queues[guild_id] = IndexedQueue(weight=song_duration)
         return self.queues[guild_id]
 
     def add_to_queue(self, guild_id, song_data):
         """
-        Add a song to the guild's queue.
+        Add a song to the guild's queue, unless the queue is full.
         
         Args:
             guild_id (int): The ID of the guild.
-            song_data (dict): The song's data (e.g., title, URL).
+            song_data (Track): The song to queue.
+        
+        Returns:
+            bool: True if the song was added, False if the queue is at ``max_length``.
         """
         queue = self.get_queue(guild_id)
+        if self.is_queue_full(guild_id):
+            return False
         queue.append(song_data)
+        self._changed(guild_id)
+        return True
+
+    def is_queue_full(self, guild_id):
+        """
+        Check whether a guild's queue reached its length limit.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        
+        Returns:
+            bool: True if no more songs can be added.
+        """
+        return bool(self.max_length) and len(self.get_queue(guild_id)) >= self.max_length
+
+    def add_to_front(self, guild_id, song_data):
+        """
+        Put a song at the front of the guild's queue, e.g. to resume it.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            song_data (Track): The song to queue.
+        """
+        self.get_queue(guild_id).appendleft(song_data)
+        self._changed(guild_id)
+
+    def _changed(self, guild_id):
+        """Mark a guild's queue as changed: it needs saving and cached views of it are stale."""
+        self._dirty.add(guild_id)
+        self.versions[guild_id] = self.versions.get(guild_id, 0) + 1
+
+    def version(self, guild_id):
+        """
+        Return a counter that changes whenever the guild's queue changes.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        
+        Returns:
+            int: The queue's version.
+        """
+        return self.versions.get(guild_id, 0)
+
+    def total_duration(self, guild_id):
+        """
+        Return the length of every queued song together, maintained by the queue itself.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        
+        Returns:
+            int: Total duration in seconds.
+        """
+        return self.get_queue(guild_id).total()
 
     def view_queue(self, guild_id):
         """
@@ -39,6 +138,127 @@ class QueueManager:
         """
         return list(self.get_queue(guild_id))
 
+    def peek(self, guild_id, count):
+        """
+        Return the next songs in the queue without removing them.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            count (int): How many songs to return at most.
+        
+        Returns:
+            list: Up to ``count`` songs from the front of the queue.
+        """
+        return list(self.get_queue(guild_id).iter_range(0, count))
+
+    def page(self, guild_id, start, stop):
+        """
+        Return a slice of the queue without copying the rest of it.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            start (int): Index of the first song.
+            stop (int): Index after the last song.
+        
+        Returns:
+            list: The songs from ``start`` up to ``stop``.
+        """
+        return list(self.get_queue(guild_id).iter_range(start, stop))
+
+    def remove(self, guild_id, index):
+        """
+        Remove the song at a position in the queue.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            index (int): Zero-based position of the song.
+        
+        Returns:
+            Track or None: The removed song, or None if the position is out of range.
+        """
+        queue = self.get_queue(guild_id)
+        if not 0 <= index < len(queue):
+            return None
+        song = queue.pop(index)
+        self._changed(guild_id)
+        self._notify_drained(guild_id)
+        return song
+
+    def move(self, guild_id, source, destination):
+        """
+        Move a song to another position in the queue.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            source (int): Zero-based position of the song.
+            destination (int): Zero-based position it should end up at.
+        
+        Returns:
+            Track or None: The moved song, or None if a position is out of range.
+        """
+        queue = self.get_queue(guild_id)
+        if not (0 <= source < len(queue) and 0 <= destination < len(queue)):
+            return None
+        song = queue.move(source, destination)
+        self._changed(guild_id)
+        return song
+
+    def jump(self, guild_id, index):
+        """
+        Drop every song before a position, so that song plays next.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            index (int): Zero-based position of the song to play next.
+        
+        Returns:
+            int or None: The number of songs dropped, or None if the position is out of range.
+        """
+        queue = self.get_queue(guild_id)
+        if not 0 <= index < len(queue):
+            return None
+        dropped = queue.drop_front(index)
+        if dropped:
+            self._changed(guild_id)
+            self._notify_drained(guild_id)
+        return dropped
+
+    def shuffle(self, guild_id):
+        """
+        Shuffle the guild's queue.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        queue = self.get_queue(guild_id)
+        if len(queue) > 1:
+            queue.shuffle()
+            self._changed(guild_id)
+
+    def dedupe(self, guild_id):
+        """
+        Remove repeated songs from the queue, keeping the first occurrence of each video.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        
+        Returns:
+            int: The number of songs removed.
+        """
+        queue = self.get_queue(guild_id)
+        seen = set()
+        unique = []
+        for song in queue:
+            if song.video_id not in seen:
+                seen.add(song.video_id)
+                unique.append(song)
+        removed = len(queue) - len(unique)
+        if removed:
+            queue.replace(unique)
+            self._changed(guild_id)
+            self._notify_drained(guild_id)
+        return removed
+
     def clear_queue(self, guild_id):
         """
         Clear the guild's queue.
@@ -48,6 +268,8 @@ class QueueManager:
         """
         if guild_id in self.queues:
             self.queues[guild_id].clear()
+            self._changed(guild_id)
+            self._notify_drained(guild_id)
 
     def skip_song(self, guild_id):
         """
@@ -57,10 +279,34 @@ class QueueManager:
             guild_id (int): The ID of the guild.
         
         Returns:
-            dict or None: The next song's data, or None if the queue is empty.
+            Track or None: The next song, or None if the queue is empty.
         """
         queue = self.get_queue(guild_id)
-        return queue.popleft() if queue else None
+        if not queue:
+            return None
+        song = queue.popleft()
+        self._changed(guild_id)
+        self._notify_drained(guild_id)
+        return song
+
+    async def wait_for_space(self, guild_id, limit):
+        """
+        Wait until the guild's queue holds fewer than ``limit`` songs.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            limit (int): The queue length to wait below.
+        """
+        while len(self.get_queue(guild_id)) >= limit:
+            event = self._drained.setdefault(guild_id, asyncio.Event())
+            event.clear()
+            await event.wait()
+
+    def _notify_drained(self, guild_id):
+        """Wake up anything waiting in ``wait_for_space`` for this guild."""
+        event = self._drained.get(guild_id)
+        if event:
+            event.set()
 
     def is_queue_available(self, guild_id):
         """
@@ -82,6 +328,172 @@ class QueueManager:
             guild_id (int): The ID of the guild.
         
         Returns:
-            dict or None: The next song's data, or None if the queue is empty.
+            Track or None: The next song, or None if the queue is empty.
+        """
+        return self.skip_song(guild_id)
+
+    def set_current(self, guild_id, song, channel_id=None):
+        """
+        Record the song a guild is playing, so it can be resumed after a restart.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+            song (Track or None): The song being played, or None when playback stopped.
+            channel_id (int): The voice channel it is played in.
+        """
+        if song is None:
+            if self.current.pop(guild_id, None) is None:
+                return
+        else:
+            self.current[guild_id] = (song, channel_id)
+        self._dirty.add(guild_id)
+
+    def _snapshot(self, guild_id):
+        """Build a guild's stored state, or None if there is nothing to keep."""
+        queue = self.queues.get(guild_id)
+        song, channel_id = self.current.get(guild_id, (None, None))
+        if not queue and song is None:
+            return None
+        position = 0.0
+        if song is not None and self.position_provider:
+            position = self.position_provider(guild_id)
+        return {
+            "queue": [track.to_dict() for track in queue or ()],
+            "current": song.to_dict() if song is not None else None,
+            "position": position,
+            "channel_id": channel_id,
+        }
+
+    async def restore(self, owns_guild=None):
+        """
+        Load the stored queues and start writing changes back to the store.
+        
+        Songs that were playing are kept in ``restored`` for the player to resume.
+        
+        Args:
+            owns_guild (callable): Filter for guild IDs to load, e.g. the guilds
+                of this cluster's shards when several processes share the store.
+        """
+        try:
+            states = await self.store.load_all()
+        except Exception as e:
+            logger.error(f"Failed to restore queues: {e}")
+            states = {}
+        if owns_guild:
+            states = {guild_id: state for guild_id, state in states.items() if owns_guild(guild_id)}
+        for guild_id, state in states.items():
+            self._load_state(guild_id, state)
+            if state.get("current"):
+                self.restored[guild_id] = (Track.from_dict(state["current"]), state.get("position", 0.0), state.get("channel_id"))
+        if states:
+            logger.info(f"Restored queues for {len(states)} guilds, {len(self.restored)} were playing")
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _load_state(self, guild_id, state, extra=()):
+        """Rebuild a guild's queue from its stored state, followed by any ``extra`` songs."""
+        songs = [Track.from_dict(song) for song in state["queue"]]
+        songs.extend(extra)
+        self.queues[guild_id] = IndexedQueue(songs, weight=song_duration)
+
+    async def evict(self, guild_id):
+        """
+        Drop an idle guild's queue state from memory, saving it to the store first.
+        
+        A guild with queued songs is only evicted when the store outlives the
+        process; otherwise its songs would be lost.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        
+        Returns:
+            bool: True if the guild was evicted.
+        """
+        if guild_id in self.current or guild_id in self._loading:
+            return False
+        queue = self.queues.get(guild_id)
+        if queue:
+            if not self.store.persistent:
+                return False
+            version = self.version(guild_id)
+            try:
+                await self.store.write_batch({guild_id: self._snapshot(guild_id)})
+            except Exception as e:
+                logger.error(f"Failed to save queue of guild {guild_id}, keeping it in memory: {e}")
+                return False
+            if self.version(guild_id) != version or guild_id in self.current:
+                return False  # Used again while it was being saved
+            self.evicted.add(guild_id)
+        elif guild_id in self._dirty:
+            version = self.version(guild_id)
+            await self.flush()  # Writes the deletion of its stored entry
+            if self.version(guild_id) != version or guild_id in self.current:
+                return False  # Used again during the flush
+        self.queues.pop(guild_id, None)
+        self.versions.pop(guild_id, None)
+        self._drained.pop(guild_id, None)
+        self._dirty.discard(guild_id)
+        return True
+
+    async def ensure_loaded(self, guild_id):
         """
-        return self.skip_song(guild_id)
\ No newline at end of file
+        Bring an evicted guild's queue back from the store before it is used.
+        
+        Args:
+            guild_id (int): The ID of the guild.
+        """
+        if guild_id not in self.evicted and guild_id not in self._loading:
+            return
+        task = self._loading.get(guild_id)
+        if task is None:
+            task = self._loading[guild_id] = asyncio.create_task(self._reload(guild_id))
+            task.add_done_callback(lambda _: self._loading.pop(guild_id, None))
+        await asyncio.shield(task)
+
+    async def _reload(self, guild_id):
+        self.evicted.discard(guild_id)
+        try:
+            state = await self.store.load(guild_id)
+        except Exception as e:
+            logger.error(f"Failed to reload queue of guild {guild_id}: {e}")
+            return
+        if state:
+            self._load_state(guild_id, state, self.queues.get(guild_id, ()))  # Keep songs queued meanwhile
+            self._changed(guild_id)
+            logger.debug(f"Reloaded evicted queue of guild {guild_id}")
+
+    async def flush(self):
+        """Write every dirty guild to the store in one batch."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        try:
+            states = {guild_id: self._snapshot(guild_id) for guild_id in dirty}
+            await self.store.write_batch(states)
+        except asyncio.CancelledError:
+            self._dirty |= dirty  # Written again by close()
+            raise
+        except Exception as e:
+            self._dirty |= dirty  # Retry on the next flush
+            logger.error(f"Failed to persist queues for {len(dirty)} guilds: {e}")
+
+    async def _flush_loop(self):
+        """Flush periodically, and checkpoint playing guilds' positions now and then."""
+        last_checkpoint = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                self._dirty.update(self.current)
+                last_checkpoint = time.monotonic()
+            await self.flush()
+
+    async def close(self):
+        """Stop the flush task, save every guild's final state and close the store."""
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        self._dirty.update(self.current)
+        try:
+            await self.flush()
+        finally:
+            await self.store.close()
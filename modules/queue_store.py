@@ -0,0 +1,180 @@
+import json
+import logging
+import time
+
+import aiosqlite
+import redis.asyncio as redis
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Settings
+QUEUE_STORE = config("QUEUE_STORE", default="sqlite")  # "memory", "sqlite" or "redis"
+QUEUE_STORE_PATH = config("QUEUE_STORE_PATH", default="dbs/queues.sqlite3")  # SQLite database file
+QUEUE_STORE_REDIS_URL = config("QUEUE_STORE_REDIS_URL", default="redis://localhost:6379/0")
+QUEUE_STORE_REDIS_KEY = config("QUEUE_STORE_REDIS_KEY", default="apollo:queues")  # Hash of guild ID -> state
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_queues (
+    guild_id INTEGER PRIMARY KEY,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class QueueStore:
+    """
+    Storage backend for guild queues.
+
+    A guild's state is a dict with its ``queue`` (list of song dicts), the ``current``
+    song, the playback ``position`` in seconds and the voice ``channel_id``.
+    """
+    persistent = True  # Whether states outlive the process
+
+    async def load_all(self):
+        """
+        Load every stored guild state.
+
+        Returns:
+            dict: guild_id -> state.
+        """
+        raise NotImplementedError
+
+    async def load(self, guild_id):
+        """
+        Load one guild's stored state.
+
+        Args:
+            guild_id (int): The ID of the guild.
+
+        Returns:
+            dict or None: The state, or None if nothing is stored.
+        """
+        raise NotImplementedError
+
+    async def write_batch(self, states):
+        """
+        Store several guild states at once.
+
+        Args:
+            states (dict): guild_id -> state, or None to delete the guild's entry.
+        """
+        raise NotImplementedError
+
+    async def close(self):
+        """Release the backend's connections."""
+
+
+class MemoryQueueStore(QueueStore):
+    """Keeps states in process memory: nothing survives a restart. Useful for tests and development."""
+    persistent = False
+
+    def __init__(self):
+        self.states = {}
+
+    async def load_all(self):
+        return dict(self.states)
+
+    async def load(self, guild_id):
+        return self.states.get(guild_id)
+
+    async def write_batch(self, states):
+        for guild_id, state in states.items():
+            if state is None:
+                self.states.pop(guild_id, None)
+            else:
+                self.states[guild_id] = state
+
+
+class SQLiteQueueStore(QueueStore):
+    """Stores each guild's state as a JSON row in a local SQLite database."""
+    def __init__(self, path=QUEUE_STORE_PATH):
+        self.path = path
+        self._db = None
+
+    async def _get_db(self):
+        if self._db is None:
+            self._db = await aiosqlite.connect(self.path)
+            await self._db.execute("PRAGMA journal_mode=WAL")
+            await self._db.executescript(SCHEMA)
+            await self._db.commit()
+        return self._db
+
+    async def load_all(self):
+        db = await self._get_db()
+        async with db.execute("SELECT guild_id, state FROM guild_queues") as cursor:
+            return {guild_id: json.loads(state) async for guild_id, state in cursor}
+
+    async def load(self, guild_id):
+        db = await self._get_db()
+        async with db.execute("SELECT state FROM guild_queues WHERE guild_id = ?", (guild_id,)) as cursor:
+            row = await cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def write_batch(self, states):
+        db = await self._get_db()
+        now = time.time()
+        await db.executemany(
+            "INSERT OR REPLACE INTO guild_queues (guild_id, state, updated_at) VALUES (?, ?, ?)",
+            [(guild_id, json.dumps(state), now) for guild_id, state in states.items() if state is not None]
+        )
+        await db.executemany(
+            "DELETE FROM guild_queues WHERE guild_id = ?",
+            [(guild_id,) for guild_id, state in states.items() if state is None]
+        )
+        await db.commit()  # One transaction per batch
+
+    async def close(self):
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+class RedisQueueStore(QueueStore):
+    """
+    Stores guild states as JSON fields of one Redis hash, so several bot
+    processes can share them.
+    """
+    def __init__(self, client=None, url=QUEUE_STORE_REDIS_URL, key=QUEUE_STORE_REDIS_KEY):
+        self.client = client or redis.from_url(url)  # Any redis.asyncio-compatible client can be injected
+        self.key = key
+
+    async def load_all(self):
+        fields = await self.client.hgetall(self.key)
+        return {int(guild_id): json.loads(state) for guild_id, state in fields.items()}
+
+    async def load(self, guild_id):
+        state = await self.client.hget(self.key, guild_id)
+        return json.loads(state) if state else None
+
+    async def write_batch(self, states):
+        async with self.client.pipeline(transaction=True) as pipe:
+            for guild_id, state in states.items():
+                if state is None:
+                    pipe.hdel(self.key, guild_id)
+                else:
+                    pipe.hset(self.key, guild_id, json.dumps(state))
+            await pipe.execute()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_queue_store(backend=QUEUE_STORE):
+    """
+    Build the queue store selected by ``QUEUE_STORE``.
+
+    Args:
+        backend (str): "memory", "sqlite" or "redis".
+
+    Returns:
+        QueueStore: The storage backend.
+    """
+    if backend == "redis":
+        return RedisQueueStore()
+    if backend == "sqlite":
+        return SQLiteQueueStore()
+    if backend != "memory":
+        logger.error(f"Unknown QUEUE_STORE {backend!r}, queues will not be persisted")
+    return MemoryQueueStore()
@@ -0,0 +1,145 @@
+import logging
+from collections import OrderedDict
+
+import discord
+from decouple import config
+
+from modules.track_resolver import YOUTUBE_WATCH_URL
+
+logger = logging.getLogger(__name__)
+
+# Settings
+QUEUE_PAGE_SIZE = int(config("QUEUE_PAGE_SIZE", default=10))  # Songs per /queue page
+QUEUE_PAGE_CACHE_SIZE = int(config("QUEUE_PAGE_CACHE_SIZE", default=500))  # Rendered pages kept across guilds
+
+TITLE_LIMIT = 80  # Longer titles are shortened so a page always fits in an embed
+
+
+def format_duration(seconds):
+    """Format seconds as m:ss, or h:mm:ss past an hour."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+def _shorten(text):
+    return text if len(text) <= TITLE_LIMIT else text[:TITLE_LIMIT - 1] + "…"
+
+
+class QueuePages:
+    """
+    Renders pages of guild queues on demand.
+
+    Only the songs of the requested page are read and formatted. Rendered pages
+    are cached with the queue's version and re-rendered once the queue changed.
+    """
+    def __init__(self, queue_manager, page_size=QUEUE_PAGE_SIZE, cache_size=QUEUE_PAGE_CACHE_SIZE):
+        self.queue_manager = queue_manager
+        self.page_size = page_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (guild_id, page) -> (queue version, rendered text)
+        self.hits = 0
+        self.misses = 0
+
+    def forget(self, guild_id):
+        """Drop the cached pages of a guild, e.g. when its state is evicted."""
+        for key in [key for key in self._cache if key[0] == guild_id]:
+            del self._cache[key]
+
+    def page_count(self, guild_id):
+        """Return the number of pages of a guild's queue, at least 1."""
+        length = len(self.queue_manager.get_queue(guild_id))
+        return max(1, -(-length // self.page_size))
+
+    def render(self, guild_id, page):
+        """
+        Get the text of one page of a guild's queue.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            page (int): Zero-based page number.
+
+        Returns:
+            str: One line per song on the page.
+        """
+        key = (guild_id, page)
+        version = self.queue_manager.version(guild_id)
+        cached = self._cache.get(key)
+        if cached and cached[0] == version:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        start = page * self.page_size
+        songs = self.queue_manager.page(guild_id, start, start + self.page_size)
+        text = "\n".join(
+            f"{start + i + 1}. [{_shorten(song.title)}]({YOUTUBE_WATCH_URL.format(song.video_id)}) "
+            f"by **{_shorten(song.artist)}** `{format_duration(song.duration)}`"
+            for i, song in enumerate(songs)
+        )
+        self._cache[key] = (version, text)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return text
+
+    def embed(self, guild_id, page):
+        """
+        Build the embed for one page of a guild's queue.
+
+        Args:
+            guild_id (int): The ID of the guild.
+            page (int): Zero-based page number, clamped to the pages that exist.
+
+        Returns:
+            tuple: The embed and the page number actually shown.
+        """
+        page_count = self.page_count(guild_id)
+        page = max(0, min(page, page_count - 1))
+        queue_length = len(self.queue_manager.get_queue(guild_id))
+        embed = discord.Embed(
+            title="Current Queue",
+            description=self.render(guild_id, page) or "The queue is empty.",
+            color=discord.Color.blurple()
+        )
+        current = self.queue_manager.current.get(guild_id)
+        if current:
+            embed.add_field(name="Now Playing", value=f"**{_shorten(current[0].title)}** by **{_shorten(current[0].artist)}**", inline=False)
+        embed.set_footer(text=(
+            f"Page {page + 1}/{page_count} • {queue_length} songs • "
+            f"{format_duration(self.queue_manager.total_duration(guild_id))} total"
+        ))
+        return embed, page
+
+
+class QueueView(discord.ui.View):
+    """Previous/next buttons for paging through a guild's queue."""
+    def __init__(self, pages, guild_id, page=0):
+        super().__init__(timeout=300)
+        self.pages = pages
+        self.guild_id = guild_id
+        self.page = page
+        self._update_buttons()
+
+    def _update_buttons(self):
+        page_count = self.pages.page_count(self.guild_id)
+        self.previous_button.disabled = self.page <= 0
+        self.next_button.disabled = self.page >= page_count - 1
+
+    async def _show(self, interaction, page):
+        embed, self.page = self.pages.embed(self.guild_id, page)
+        self._update_buttons()
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(style=discord.ButtonStyle.secondary, emoji="◀️")
+    async def previous_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the previous page."""
+        await self._show(interaction, self.page - 1)
+
+    @discord.ui.button(style=discord.ButtonStyle.secondary, emoji="▶️")
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Show the next page."""
+        await self._show(interaction, self.page + 1)
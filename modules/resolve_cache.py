@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+
+import aiosqlite
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+# Settings
+RESOLVE_CACHE_PATH = config("RESOLVE_CACHE_PATH", default="dbs/resolve_cache.sqlite3")  # Empty disables the disk tier
+RESOLVE_CACHE_MEMORY_SIZE = int(config("RESOLVE_CACHE_MEMORY_SIZE", default=5000))  # Entries per in-memory tier
+RESOLVE_CACHE_METADATA_TTL = int(config("RESOLVE_CACHE_METADATA_TTL", default=30 * 24 * 3600))  # Seconds
+STREAM_URL_DEFAULT_TTL = int(config("STREAM_URL_DEFAULT_TTL", default=3600))  # When the URL has no expire=
+STREAM_URL_EXPIRY_MARGIN = int(config("STREAM_URL_EXPIRY_MARGIN", default=600))  # Treat URLs as stale this early
+
+EXPIRE_REGEX = re.compile(r"[?&/]expire[=/](\d+)")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    cached_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS streams (
+    video_id TEXT PRIMARY KEY,
+    audio_url TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def normalize_query(query):
+    """Lower-case a free-text query and collapse its whitespace."""
+    return " ".join(query.lower().split())
+
+
+def query_key(query):
+    """Cache key for a free-text Spotify search."""
+    return f"q:{normalize_query(query)}"
+
+
+def youtube_search_key(query):
+    """Cache key for a ``ytsearch:`` lookup."""
+    return f"ytq:{normalize_query(query)}"
+
+
+def spotify_key(track_id):
+    """Cache key for a Spotify track ID."""
+    return f"sp:{track_id}"
+
+
+def youtube_key(video_id):
+    """Cache key for a YouTube video ID."""
+    return f"yt:{video_id}"
+
+
+def stream_expiry(audio_url):
+    """
+    Work out when a signed stream URL stops being usable.
+
+    Args:
+        audio_url (str): A googlevideo (or other) direct stream URL.
+
+    Returns:
+        float: Unix time after which the URL should be re-resolved.
+    """
+    match = EXPIRE_REGEX.search(audio_url)
+    if match:
+        return int(match.group(1)) - STREAM_URL_EXPIRY_MARGIN
+    return time.time() + STREAM_URL_DEFAULT_TTL
+
+
+class ResolveCache:
+    """
+    Two-tier cache for resolved tracks: an in-memory LRU in front of SQLite.
+
+    Stable metadata (title, artist, duration, video ID) is stored per key and
+    kept for a long time. Direct stream URLs are stored per video ID and expire
+    with the URL's own ``expire=`` parameter.
+    """
+    def __init__(self, path=RESOLVE_CACHE_PATH, memory_size=RESOLVE_CACHE_MEMORY_SIZE,
+                 metadata_ttl=RESOLVE_CACHE_METADATA_TTL):
+        self.path = path
+        self.memory_size = memory_size
+        self.metadata_ttl = metadata_ttl
+        self._metadata = OrderedDict()  # key -> (record, cached_at)
+        self._streams = OrderedDict()  # video_id -> (audio_url, expires_at)
+        self._db = None
+        self._db_lock = asyncio.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stream_hits = 0
+        self.stream_misses = 0
+        self.stream_expired = 0
+
+    async def _get_db(self):
+        """Open the SQLite tier on first use, or return None if it is disabled."""
+        if self._db is None and self.path:
+            async with self._db_lock:
+                if self._db is None and self.path:
+                    try:
+                        db = await aiosqlite.connect(self.path)
+                        await db.execute("PRAGMA journal_mode=WAL")
+                        await db.executescript(SCHEMA)
+                        await db.commit()
+                        self._db = db
+                    except Exception as e:
+                        logger.error(f"Could not open resolve cache at {self.path}, using memory only: {e}")
+                        self.path = None
+        return self._db
+
+    def _remember(self, store, key, value):
+        """Insert into an in-memory tier, evicting the least recently used entry."""
+        store[key] = value
+        store.move_to_end(key)
+        if len(store) > self.memory_size:
+            store.popitem(last=False)
+
+    async def get(self, key):
+        """
+        Look up a metadata record.
+
+        Args:
+            key (str): A key built by one of the ``*_key`` helpers.
+
+        Returns:
+            dict or None: The cached record, or None on a miss.
+        """
+        now = time.time()
+        entry = self._metadata.get(key)
+        if entry and now - entry[1] < self.metadata_ttl:
+            self._metadata.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+        db = await self._get_db()
+        if db:
+            try:
+                async with db.execute("SELECT value, cached_at FROM metadata WHERE key = ?", (key,)) as cursor:
+                    row = await cursor.fetchone()
+                if row and now - row[1] < self.metadata_ttl:
+                    record = json.loads(row[0])
+                    self._remember(self._metadata, key, (record, row[1]))
+                    self.disk_hits += 1
+                    return record
+            except Exception as e:
+                logger.error(f"Resolve cache read failed for {key}: {e}")
+
+        self.misses += 1
+        return None
+
+    async def put(self, key, record):
+        """
+        Store a metadata record in both tiers.
+
+        Args:
+            key (str): A key built by one of the ``*_key`` helpers.
+            record (dict): JSON-serialisable track metadata.
+        """
+        now = time.time()
+        self._remember(self._metadata, key, (record, now))
+        db = await self._get_db()
+        if db:
+            try:
+                await db.execute(
+                    "INSERT OR REPLACE INTO metadata (key, value, cached_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(record), now),
+                )
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Resolve cache write failed for {key}: {e}")
+
+    async def get_stream(self, video_id):
+        """
+        Look up a still-valid direct stream URL.
+
+        Args:
+            video_id (str): The YouTube video ID.
+
+        Returns:
+            str or None: The stream URL, or None if missing or about to expire.
+        """
+        now = time.time()
+        entry = self._streams.get(video_id)
+        if entry is None:
+            db = await self._get_db()
+            if db:
+                try:
+                    async with db.execute(
+                        "SELECT audio_url, expires_at FROM streams WHERE video_id = ?", (video_id,)
+                    ) as cursor:
+                        row = await cursor.fetchone()
+                    if row:
+                        entry = (row[0], row[1])
+                        self._remember(self._streams, video_id, entry)
+                except Exception as e:
+                    logger.error(f"Resolve cache read failed for stream {video_id}: {e}")
+
+        if entry is None:
+            self.stream_misses += 1
+            return None
+        if entry[1] <= now:
+            self._streams.pop(video_id, None)
+            self.stream_expired += 1
+            return None
+        self._streams.move_to_end(video_id)
+        self.stream_hits += 1
+        return entry[0]
+
+    async def put_stream(self, video_id, audio_url):
+        """
+        Store a direct stream URL until shortly before it expires.
+
+        Args:
+            video_id (str): The YouTube video ID.
+            audio_url (str): The signed stream URL.
+        """
+        expires_at = stream_expiry(audio_url)
+        self._remember(self._streams, video_id, (audio_url, expires_at))
+        db = await self._get_db()
+        if db:
+            try:
+                await db.execute(
+                    "INSERT OR REPLACE INTO streams (video_id, audio_url, expires_at) VALUES (?, ?, ?)",
+                    (video_id, audio_url, expires_at),
+                )
+                await db.commit()
+            except Exception as e:
+                logger.error(f"Resolve cache write failed for stream {video_id}: {e}")
+
+    def stats(self):
+        """
+        Return hit and miss counters for both tiers.
+
+        Returns:
+            dict: Counters and the current in-memory entry counts.
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "stream_hits": self.stream_hits,
+            "stream_misses": self.stream_misses,
+            "stream_expired": self.stream_expired,
+            "memory_entries": len(self._metadata),
+            "memory_streams": len(self._streams),
+        }
+
+    async def close(self):
+        """Drop expired stream rows and close the SQLite tier."""
+        if self._db is not None:
+            try:
+                await self._db.execute("DELETE FROM streams WHERE expires_at <= ?", (time.time(),))
+                await self._db.commit()
+            finally:
+                await self._db.close()
+                self._db = None
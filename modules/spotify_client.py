@@ -0,0 +1,204 @@
+import asyncio
+import base64
+import json
+import logging
+import time
+
+import aiohttp
+from decouple import config
+
+from modules.metrics import RESOLVE_ERRORS, RESOLVE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Settings
+SPOT_CLIENT_ID = config("SPOT_CLIENT_ID", default=None)
+SPOT_SECRET = config("SPOT_SECRET", default=None)
+SPOTIFY_BACKEND = config("SPOTIFY_BACKEND", default="http")  # "http" or "stub"
+SPOTIFY_STUB_FILE = config("SPOTIFY_STUB_FILE", default=None)  # JSON fixtures for the stub backend
+SPOTIFY_STUB_LATENCY = float(config("SPOTIFY_STUB_LATENCY", default=0))  # Seconds added to every stub call
+SPOTIFY_POOL_SIZE = int(config("SPOTIFY_POOL_SIZE", default=10))  # Keep-alive connections to api.spotify.com
+SPOTIFY_TIMEOUT = float(config("SPOTIFY_TIMEOUT", default=10))
+
+API_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+class SpotifyError(Exception):
+    """Raised when the Spotify API answers with an error status."""
+    def __init__(self, status, message):
+        super().__init__(f"Spotify API error {status}: {message}")
+        self.status = status
+
+
+class HTTPSpotifyBackend:
+    """Spotify Web API backend using one pooled aiohttp session for the whole process."""
+    def __init__(self, client_id=SPOT_CLIENT_ID, client_secret=SPOT_SECRET, pool_size=SPOTIFY_POOL_SIZE):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.pool_size = pool_size
+        self._session = None
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = None
+
+    def _get_session(self):
+        """Create the shared session lazily, it must be bound to the running loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=SPOTIFY_TIMEOUT),
+            )
+            self._token_lock = asyncio.Lock()
+        return self._session
+
+    async def _get_token(self):
+        """Return a valid access token, refreshing it at most once for concurrent callers."""
+        if self._token and time.time() < self._token_expires_at:
+            return self._token
+        async with self._token_lock:
+            if self._token and time.time() < self._token_expires_at:
+                return self._token  # Another caller refreshed it while we waited
+            credentials = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+            async with self._session.post(
+                TOKEN_URL,
+                data={"grant_type": "client_credentials"},
+                headers={"Authorization": f"Basic {credentials}"},
+            ) as response:
+                if response.status != 200:
+                    raise SpotifyError(response.status, await response.text())
+                payload = await response.json()
+            self._token = payload["access_token"]
+            self._token_expires_at = time.time() + payload["expires_in"] - 60  # Refresh a minute early
+            logger.info("Refreshed Spotify access token.")
+            return self._token
+
+    async def get(self, path, params=None):
+        """
+        Send a GET request to the Spotify Web API.
+
+        Args:
+            path (str): Endpoint path, e.g. ``/tracks/{id}``.
+            params (dict): Query string parameters.
+
+        Returns:
+            dict: The decoded JSON response.
+        """
+        session = self._get_session()
+        for attempt in range(2):
+            token = await self._get_token()
+            async with session.get(
+                API_URL + path,
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+            ) as response:
+                if response.status == 401 and attempt == 0:
+                    self._token = None  # Token was revoked early, refresh and retry once
+                    continue
+                if response.status == 429 and attempt == 0:
+                    await asyncio.sleep(int(response.headers.get("Retry-After", 1)))
+                    continue
+                if response.status != 200:
+                    raise SpotifyError(response.status, await response.text())
+                return await response.json()
+
+    async def close(self):
+        """Close the pooled session."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class StubSpotifyBackend:
+    """Offline Spotify backend serving canned responses, for tests and benchmarks."""
+    def __init__(self, fixtures=None, latency=SPOTIFY_STUB_LATENCY):
+        self.fixtures = fixtures or {}
+        self.latency = latency
+        self.calls = []
+
+    @classmethod
+    def from_file(cls, path, latency=SPOTIFY_STUB_LATENCY):
+        """Build a stub from a JSON file mapping request paths to responses."""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), latency)
+
+    async def get(self, path, params=None):
+        """
+        Return the canned response for a request path.
+
+        Keys of the form ``<path>?q=<query>``, ``<path>?offset=<n>`` and
+        ``<path>?ids=<ids>`` are tried before the bare path, so searches, pages
+        and batches can have their own fixtures. Paths without a fixture answer
+        like the real API does for unknown IDs, except ``/search`` which returns
+        an empty result.
+        """
+        self.calls.append((path, params))
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for name in ("q", "offset", "ids"):
+            if params and name in params and f"{path}?{name}={params[name]}" in self.fixtures:
+                return self.fixtures[f"{path}?{name}={params[name]}"]
+        if path in self.fixtures:
+            return self.fixtures[path]
+        if path == "/search":
+            return {"tracks": {"items": []}}
+        raise SpotifyError(404, f"No stub fixture for {path}")
+
+    async def close(self):
+        pass
+
+
+class SpotifyClient:
+    """Shared, non-blocking access to the Spotify API for every cog."""
+    def __init__(self, backend=None):
+        self.backend = backend or self._default_backend()
+
+    @staticmethod
+    def _default_backend():
+        if SPOTIFY_BACKEND == "stub":
+            if SPOTIFY_STUB_FILE:
+                return StubSpotifyBackend.from_file(SPOTIFY_STUB_FILE)
+            return StubSpotifyBackend()
+        return HTTPSpotifyBackend()
+
+    async def _get(self, operation, path, params=None):
+        """Send a request through the backend, recording its latency under ``operation``."""
+        started = time.monotonic()
+        try:
+            response = await self.backend.get(path, params)
+        except Exception:
+            RESOLVE_ERRORS.inc(source="spotify", operation=operation)
+            raise
+        RESOLVE_SECONDS.observe(time.monotonic() - started, source="spotify", operation=operation)
+        return response
+
+    async def search(self, q, type="track", limit=1):
+        """Search the Spotify catalogue, mirroring ``spotipy.Spotify.search``."""
+        return await self._get("search", "/search", {"q": q, "type": type, "limit": limit})
+
+    async def track(self, track_id):
+        """Fetch a single track, mirroring ``spotipy.Spotify.track``."""
+        return await self._get("track", f"/tracks/{track_id}")
+
+    async def tracks(self, track_ids):
+        """Fetch up to 50 tracks in one request, mirroring ``spotipy.Spotify.tracks``."""
+        return await self._get("tracks", "/tracks", {"ids": ",".join(track_ids)})
+
+    async def playlist_tracks(self, playlist_id, limit=100, offset=0, fields=None):
+        """Fetch one page of playlist items, mirroring ``spotipy.Spotify.playlist_tracks``."""
+        params = {"limit": limit, "offset": offset}
+        if fields:
+            params["fields"] = fields
+        return await self._get("playlist_tracks", f"/playlists/{playlist_id}/tracks", params)
+
+    async def album(self, album_id):
+        """Fetch an album with its first page of tracks, mirroring ``spotipy.Spotify.album``."""
+        return await self._get("album", f"/albums/{album_id}")
+
+    async def album_tracks(self, album_id, limit=50, offset=0):
+        """Fetch one page of album tracks, mirroring ``spotipy.Spotify.album_tracks``."""
+        return await self._get("album_tracks", f"/albums/{album_id}/tracks", {"limit": limit, "offset": offset})
+
+    async def close(self):
+        """Release the backend's connections."""
+        await self.backend.close()
@@ -0,0 +1,62 @@
+import sys
+
+
+class Track:
+    """
+    An immutable queued song.
+
+    Uses ``__slots__`` instead of a per-song dict, interns the artist name
+    (the same artists repeat across playlists and guilds) and stores the
+    duration as an int of seconds.
+    """
+    __slots__ = ("title", "artist", "video_id", "thumbnail", "duration")
+
+    def __init__(self, title, artist, video_id, thumbnail=None, duration=0):
+        set_field = object.__setattr__
+        set_field(self, "title", title)
+        set_field(self, "artist", sys.intern(artist))
+        set_field(self, "video_id", video_id)
+        set_field(self, "thumbnail", thumbnail)
+        set_field(self, "duration", int(duration or 0))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Track is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Track is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Track):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((self.video_id, self.title, self.artist))
+
+    def __repr__(self):
+        return f"Track({self.title!r} by {self.artist!r}, {self.video_id})"
+
+    def __reduce__(self):
+        return (Track, tuple(getattr(self, name) for name in self.__slots__))
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a track from its stored form.
+
+        Args:
+            data (dict): The fields written by ``to_dict``.
+
+        Returns:
+            Track: The track.
+        """
+        return cls(data["title"], data["artist"], data["video_id"], data.get("thumbnail"), data.get("duration", 0))
+
+    def to_dict(self):
+        """
+        Return the track as a JSON-serialisable dict, e.g. for the queue store.
+
+        Returns:
+            dict: The track's fields.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
@@ -0,0 +1,331 @@
+import asyncio
+import logging
+import re
+
+from decouple import config
+
+from modules.resolve_cache import query_key, spotify_key, youtube_key, youtube_search_key
+
+logger = logging.getLogger(__name__)
+
+# Settings
+PREFETCH_AHEAD = int(config("PREFETCH_AHEAD", default=2))  # Upcoming songs whose stream URL is resolved early
+
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v={}"
+
+SPOTIFY_TRACK_REGEX = re.compile(r"https?://open\.spotify\.com/track/([a-zA-Z0-9]+)")
+YOUTUBE_VIDEO_REGEX = re.compile(r"https?://(www\.)?(youtube\.com|youtu\.be)/(watch\?v=)?([a-zA-Z0-9_-]+)")
+SPOTIFY_PLAYLIST_REGEX = re.compile(r"https?://open\.spotify\.com/playlist/([a-zA-Z0-9]+)")
+SPOTIFY_ALBUM_REGEX = re.compile(r"https?://open\.spotify\.com/album/([a-zA-Z0-9]+)")
+
+# Only the playlist item fields spotify_track_data reads
+PLAYLIST_FIELDS = "items(track(id,name,duration_ms,artists(name),album(images))),next"
+PLAYLIST_PAGE_SIZE = 100
+ALBUM_PAGE_SIZE = 50
+TRACKS_BATCH_SIZE = 50  # Most track IDs the Spotify API accepts per /tracks request
+
+
+def spotify_track_data(track):
+    """Reduce a Spotify track object to the fields the cogs use."""
+    return {
+        "track_id": track.get("id"),
+        "song_title": track["name"],
+        "artist_name": track["artists"][0]["name"],
+        "album_cover": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+        "duration": track["duration_ms"] // 1000
+    }
+
+
+def youtube_video_data(info):
+    """Reduce a yt-dlp info dict to the fields the cogs use."""
+    return {
+        "video_id": info['id'],
+        "audio_url": info['url'],
+        "title": info['title'],
+        "duration": info['duration'],
+        "thumbnail": info.get('thumbnails', [{}])[-1].get('url', None),
+        "acodec": info.get('acodec')
+    }
+
+
+class TrackResolver:
+    """Cached Spotify and YouTube lookups shared by the music cogs."""
+    def __init__(self, spotify, ytdl_resolver, cache, audio_cache=None):
+        self.spotify = spotify
+        self.ytdl_resolver = ytdl_resolver
+        self.cache = cache
+        self.audio_cache = audio_cache
+        self._prefetching = {}  # video_id -> task warming its stream URL
+        self._in_flight = {}  # Cache key -> task of the upstream lookup being shared
+        self.upstream_calls = 0
+        self.coalesced = 0  # Lookups that joined one already in flight instead of calling upstream
+
+    async def _coalesce(self, key, fetch):
+        """
+        Share one upstream lookup between concurrent callers asking for the same key.
+
+        The first caller starts ``fetch()`` as a task; callers arriving before it
+        finishes await the same task and get its result or its exception. A
+        cancelled caller leaves the lookup running for the others.
+
+        Args:
+            key (str): The normalized cache key of the lookup.
+            fetch (callable): Coroutine function doing the upstream call.
+
+        Returns:
+            The result of ``fetch()``.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.upstream_calls += 1
+            task = asyncio.create_task(fetch())
+            task.add_done_callback(lambda done: self._finish_flight(key, done))
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish_flight(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # Every caller may have given up; keep asyncio from reporting it as unretrieved
+
+    def stats(self):
+        """
+        Return upstream lookup counters.
+
+        Returns:
+            dict: Upstream calls made, calls saved by coalescing and lookups in flight.
+        """
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    async def search_song_on_spotify(self, query):
+        """Search for a song on Spotify using the provided query."""
+        key = query_key(query)
+        cached = await self.cache.get(key)
+        if cached:
+            return cached
+
+        async def fetch():
+            results = await self.spotify.search(q=query, type="track", limit=1)
+            if not results["tracks"]["items"]:
+                return None
+            data = spotify_track_data(results["tracks"]["items"][0])
+            await self.cache.put(key, data)
+            await self.cache.put(spotify_key(data["track_id"]), data)
+            return data
+
+        try:
+            return await self._coalesce(key, fetch)
+        except Exception as e:
+            logger.error(f"Error searching Spotify: {e}")
+            return None
+
+    async def get_spotify_track_info(self, track_id):
+        """Get track information from Spotify using the track ID."""
+        key = spotify_key(track_id)
+        cached = await self.cache.get(key)
+        if cached:
+            return cached
+
+        async def fetch():
+            data = spotify_track_data(await self.spotify.track(track_id))
+            await self.cache.put(key, data)
+            return data
+
+        try:
+            return await self._coalesce(key, fetch)
+        except Exception as e:
+            logger.error(f"Error fetching Spotify track info: {e}")
+            return None
+
+    async def get_spotify_tracks(self, track_ids):
+        """
+        Get several Spotify tracks, fetching the uncached ones in batched requests.
+
+        Args:
+            track_ids (list): Spotify track IDs.
+
+        Returns:
+            list: Spotify track data for each ID, in order, or None for tracks
+            that were not found.
+        """
+        found = {}
+        missing = []
+        for track_id in dict.fromkeys(track_ids):
+            cached = await self.cache.get(spotify_key(track_id))
+            if cached:
+                found[track_id] = cached
+            else:
+                missing.append(track_id)
+
+        async def fetch(batch):
+            try:
+                response = await self.spotify.tracks(batch)
+            except Exception as e:
+                logger.error(f"Error fetching Spotify tracks: {e}")
+                return
+            for track_id, track in zip(batch, response["tracks"]):
+                if track:  # Unknown IDs come back as null
+                    data = found[track_id] = spotify_track_data(track)
+                    await self.cache.put(spotify_key(track_id), data)
+
+        await asyncio.gather(*(
+            fetch(missing[start:start + TRACKS_BATCH_SIZE]) for start in range(0, len(missing), TRACKS_BATCH_SIZE)
+        ))
+        return [found.get(track_id) for track_id in track_ids]
+
+    # Parses through the playlist a page at a time
+    async def iter_spotify_playlist_tracks(self, playlist_id):
+        """
+        Yield every track of a Spotify playlist, fetching pages as they are consumed.
+
+        Args:
+            playlist_id (str): The Spotify playlist ID.
+
+        Yields:
+            dict: Spotify track data, in playlist order.
+        """
+        offset = 0
+        while True:
+            try:
+                page = await self.spotify.playlist_tracks(
+                    playlist_id, limit=PLAYLIST_PAGE_SIZE, offset=offset, fields=PLAYLIST_FIELDS
+                )
+            except Exception as e:
+                logger.error(f"Error fetching Spotify playlist tracks: {e}")
+                return
+            for item in page['items']:
+                if item.get('track') and item['track'].get('id'):  # Skip local files and removed tracks
+                    yield spotify_track_data(item['track'])
+            if not page.get('next'):
+                return
+            offset += PLAYLIST_PAGE_SIZE
+
+    async def iter_spotify_album_tracks(self, album_id):
+        """
+        Yield every track of a Spotify album, fetching pages as they are consumed.
+
+        Args:
+            album_id (str): The Spotify album ID.
+
+        Yields:
+            dict: Spotify track data, in album order.
+        """
+        try:
+            album = await self.spotify.album(album_id)
+        except Exception as e:
+            logger.error(f"Error fetching Spotify album: {e}")
+            return
+        images = {"images": album["images"]}  # Album track objects do not carry the cover
+        page = album['tracks']
+        offset = 0
+        while True:
+            for track in page['items']:
+                yield spotify_track_data({**track, "album": images})
+            if not page.get('next'):
+                return
+            offset += len(page['items'])
+            try:
+                page = await self.spotify.album_tracks(album_id, limit=ALBUM_PAGE_SIZE, offset=offset)
+            except Exception as e:
+                logger.error(f"Error fetching Spotify album tracks: {e}")
+                return
+
+    async def get_youtube_video_info(self, video_id):
+        """Get video information from YouTube using the video ID."""
+        key = youtube_key(video_id)
+        cached = await self.cache.get(key)
+        if cached:
+            audio_url = await self.cache.get_stream(video_id)
+            if audio_url:
+                return {**cached, "audio_url": audio_url}
+
+        async def fetch():
+            data = youtube_video_data(await self.ytdl_resolver.extract_info(video_id, download=False))
+            await self._store_video(data)
+            return data
+
+        try:
+            return await self._coalesce(key, fetch)
+        except Exception as e:
+            logger.error(f"Error fetching YouTube video info: {e}")
+            return None
+
+    async def search_youtube_audio(self, query):
+        """Search for audio on YouTube using the provided query."""
+        key = youtube_search_key(query)
+        cached = await self.cache.get(key)
+        if cached:
+            # The video is known, only its stream URL may need refreshing
+            return await self.get_youtube_video_info(cached["video_id"])
+
+        async def fetch():
+            info = await self.ytdl_resolver.extract_info(f"ytsearch:{query}", download=False)
+            if not info.get('entries'):
+                logger.error("No results found for the query.")
+                return None
+            data = youtube_video_data(info['entries'][0])
+            await self._store_video(data)
+            await self.cache.put(key, {"video_id": data["video_id"]})
+            return data
+
+        try:
+            return await self._coalesce(key, fetch)
+        except Exception as e:
+            logger.error(f"Error extracting YouTube audio: {e}")
+            return None
+
+    async def _store_video(self, data):
+        """Cache a video's stable metadata and its short-lived stream URL separately."""
+        metadata = {k: v for k, v in data.items() if k != "audio_url"}
+        await self.cache.put(youtube_key(data["video_id"]), metadata)
+        await self.cache.put_stream(data["video_id"], data["audio_url"])
+
+    async def get_stream(self, song):
+        """
+        Resolve the stream of a queued song right before it plays.
+
+        Args:
+            song (Track): The queued song.
+
+        Returns:
+            dict or None: The video data with its ``audio_url`` and ``acodec``,
+            or None if the video could not be resolved. Tracks in the audio
+            cache point at the local file and are flagged ``local``.
+        """
+        if self.audio_cache:
+            local = await self.audio_cache.lookup(song.video_id)
+            if local:
+                return local
+        return await self.get_youtube_video_info(song.video_id)  # Joins a prefetch still in flight
+
+    def record_play(self, song):
+        """
+        Count a play of a song towards storing it in the audio cache.
+
+        Args:
+            song (Track): The song that started playing.
+        """
+        if self.audio_cache:
+            video_id = song.video_id
+            self.audio_cache.record_play(video_id, lambda: self.get_youtube_video_info(video_id))
+
+    def prefetch(self, songs):
+        """
+        Resolve the stream URLs of upcoming songs in the background.
+
+        Args:
+            songs (list): The next queued Tracks, in play order.
+        """
+        for song in songs[:PREFETCH_AHEAD]:
+            video_id = song.video_id
+            if video_id not in self._prefetching:
+                task = asyncio.create_task(self.get_youtube_video_info(video_id))
+                task.add_done_callback(lambda _, video_id=video_id: self._prefetching.pop(video_id, None))
+                self._prefetching[video_id] = task
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+from modules.audio_source import AUDIO_MODE
+from modules.metrics import RESOLVE_ERRORS, RESOLVE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# YouTube downloader configuration shared by every worker thread
+YTDL_FORMAT_OPTIONS = {
+    # Opus (webm) streams can be passed to Discord without transcoding
+    'format': 'bestaudio[acodec=opus]/bestaudio/best' if AUDIO_MODE == "opus" else 'bestaudio[ext=m4a]/bestaudio/best',
+    'buffersize': 1024 * 1024 * 10,  # 10MB buffer
+    'retries': 3,  # Add retry mechanism
+    'fragment_retries': 3,  # Retry fragmented downloads
+    'socket_timeout': 15,  # Increase socket timeout
+    'source_address': '0.0.0.0',  # Bind to all network interfaces
+    'no_color': True,
+    'ignoreerrors': False,  # Be strict about errors
+    'no_warnings': True,
+    'quiet': True,
+}
+
+# Settings
+YTDL_WORKERS = int(config("YTDL_WORKERS", default=4))  # Concurrent extractions
+YTDL_TIMEOUT = float(config("YTDL_TIMEOUT", default=30))  # Seconds per extraction, queue wait included
+YTDL_QUEUE_WAIT_WARN = float(config("YTDL_QUEUE_WAIT_WARN", default=2))  # Log when a job waited longer than this
+
+
+class YTDLResolver:
+    """Runs yt-dlp extraction in a bounded thread pool so it never blocks the event loop."""
+    def __init__(self, max_workers=YTDL_WORKERS, timeout=YTDL_TIMEOUT, ytdl_options=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ytdl_options = ytdl_options or YTDL_FORMAT_OPTIONS
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ytdl")
+        self._local = threading.local()  # One YoutubeDL per worker thread, it is not thread-safe
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=256)  # Recent queue-wait samples in seconds
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cancelled = 0
+
+    def _get_ytdl(self):
+        """Return the YoutubeDL instance owned by the current worker thread."""
+        ytdl = getattr(self._local, "ytdl", None)
+        if ytdl is None:
+            import yt_dlp  # Imported on first use, off the event loop; it takes a noticeable share of startup
+            ytdl = yt_dlp.YoutubeDL(self.ytdl_options)
+            self._local.ytdl = ytdl
+        return ytdl
+
+    def _run(self, submitted_at, query, download):
+        """Worker-side wrapper that records how long the job sat in the queue."""
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            self.pending -= 1
+            self._waits.append(waited)
+        if waited > YTDL_QUEUE_WAIT_WARN:
+            logger.warning(f"yt-dlp job waited {waited:.2f}s for a worker (pool size {self.max_workers}): {query}")
+        return self._get_ytdl().extract_info(query, download=download)
+
+    async def extract_info(self, query, download=False, timeout=None):
+        """
+        Run ``YoutubeDL.extract_info`` on a worker thread.
+
+        Jobs that have not started yet are dropped when the caller is cancelled or
+        times out; a job already running finishes in the background and its result
+        is discarded.
+
+        Args:
+            query (str): A URL, video ID or ``ytsearch:`` query.
+            download (bool): Whether yt-dlp should download the media.
+            timeout (float): Seconds to wait, defaults to the resolver timeout.
+
+        Returns:
+            dict: The info dict produced by yt-dlp.
+
+        Raises:
+            asyncio.TimeoutError: If the extraction did not finish in time.
+        """
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        operation = "search" if query.startswith("ytsearch") else "video"
+        started = time.monotonic()
+        future = self._executor.submit(self._run, started, query, download)
+        try:
+            info = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._forget(future)
+            RESOLVE_ERRORS.inc(source="youtube", operation=operation)
+            logger.error(f"yt-dlp extraction timed out after {timeout or self.timeout}s: {query}")
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            self._forget(future)
+            raise
+        except Exception:
+            self.failed += 1
+            RESOLVE_ERRORS.inc(source="youtube", operation=operation)
+            raise
+        self.completed += 1
+        RESOLVE_SECONDS.observe(time.monotonic() - started, source="youtube", operation=operation)  # Queue wait included
+        return info
+
+    def _forget(self, future):
+        """Keep the pending count right for jobs dropped before a worker picked them up."""
+        if future.cancel():
+            with self._lock:
+                self.pending = max(0, self.pending - 1)
+
+    def stats(self):
+        """
+        Return pool counters and queue-wait figures for sizing the pool.
+
+        Returns:
+            dict: Worker count, job counters and queue-wait averages in seconds.
+        """
+        with self._lock:
+            waits = sorted(self._waits)
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "queue_wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "queue_wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "queue_wait_max": waits[-1] if waits else 0.0,
+        }
+
+    def shutdown(self):
+        """Stop the worker pool, dropping any jobs that have not started."""
+        self._executor.shutdown(wait=False, cancel_futures=True)